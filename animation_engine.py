@@ -0,0 +1,256 @@
+import math
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Pixels (frames x region) evaluated together; keeps a batch's temporaries in
+# cache while still amortising NumPy's per-call overhead over many frames
+BATCH_PIXELS = 1 << 18
+
+
+# Parameters: a constant, or a function of a float64 array of timestamps
+# returning one value per timestamp
+
+def evaluate(value, times):
+    if callable(value):
+        return np.broadcast_to(np.asarray(value(times), dtype=np.float64), times.shape)
+    return np.full(times.shape, value, dtype=np.float64)
+
+
+def wave(amplitude, period=1.0, phase=0.0, offset=0.0):
+    # offset + amplitude * sin(2 pi t / period + phase)
+    def param(times):
+        return offset + amplitude * np.sin(times / period * 2 * math.pi + phase)
+    return param
+
+
+def ramp(start, end, duration, delay=0.0):
+    # Linear from start to end over `duration` seconds after `delay`, e.g. a
+    # fade-in or a progress bar
+    def param(times):
+        if duration <= 0:
+            return np.where(times >= delay, end, start)
+        return start + (end - start) * np.clip((times - delay) / duration, 0.0, 1.0)
+    return param
+
+
+def _opacity_levels(opacity, times):
+    # 0-1 opacity as uint8 alpha, truncated like int(255 * opacity)
+    return (np.clip(evaluate(opacity, times), 0.0, 1.0) * 255).astype(np.uint16)
+
+
+# Shapes for field layers: coverage of each pixel centre from its offset to
+# the layer's origin, rotated with the layer. `across` runs to the right and
+# `along` upwards at rotation 0; `extent` bounds the distance of any covered
+# pixel from the origin.
+
+class Disc:
+    def __init__(self, radius):
+        self.radius = radius
+        self.extent = radius
+
+    def __call__(self, across, along):
+        return np.hypot(across, along) <= self.radius
+
+
+class Ring:
+    def __init__(self, radius, width):
+        self.radius = radius
+        self.width = width
+        self.extent = radius
+
+    def __call__(self, across, along):
+        dist = np.hypot(across, along)
+        return (dist <= self.radius) & (dist >= self.radius - self.width)
+
+
+class Bar:
+    # From the origin `length` pixels upwards, e.g. a clock hand
+    def __init__(self, length, width):
+        self.length = length
+        self.width = width
+        self.extent = math.hypot(length, width / 2)
+
+    def __call__(self, across, along):
+        return (along >= 0) & (along <= self.length) & (np.abs(across) <= self.width / 2)
+
+
+def ellipse_mask(rx, ry):
+    # Filled ellipse drawn once with PIL, the same pixels ImageDraw.ellipse
+    # gives for the box [x - rx, y - ry, x + rx, y + ry]
+    image = Image.new('L', (2 * rx + 1, 2 * ry + 1), 0)
+    ImageDraw.Draw(image).ellipse([0, 0, 2 * rx, 2 * ry], fill=255)
+    return np.asarray(image)
+
+
+def _divide_255(values, carry):
+    # values = round(values / 255) in place, without an integer divide
+    values += 128
+    np.right_shift(values, 8, out=carry)
+    values += carry
+    values >>= 8
+
+
+def _blend_over(dst, src, tmp, carry):
+    # dst = src + dst * (255 - src) / 255 in uint16, rounded like
+    # RegionCompositor.blend
+    np.subtract(255, src, out=tmp)
+    tmp *= dst
+    _divide_255(tmp, carry)
+    np.add(tmp, src, out=dst)
+
+
+class MaskLayer:
+    # A precomputed coverage mask moved and faded per frame. (x, y) is where
+    # the mask's centre pixel goes.
+    def __init__(self, mask, x, y, opacity=1.0):
+        self.mask = mask.astype(np.uint16)
+        self.x = x
+        self.y = y
+        self.opacity = opacity
+        self.anchor = (mask.shape[1] // 2, mask.shape[0] // 2)
+
+    def pixels(self):
+        return self.mask.size
+
+    def render(self, out, times, scratch):
+        frames, height, width = out.shape
+        mh, mw = self.mask.shape
+        left = np.floor(evaluate(self.x, times)).astype(np.intp) - self.anchor[0]
+        top = np.floor(evaluate(self.y, times)).astype(np.intp) - self.anchor[1]
+
+        dst, src, tmp, carry = scratch((frames, mh, mw))
+        # mask * opacity / 255, rounded, for every frame at once
+        np.multiply(self.mask, _opacity_levels(self.opacity, times)[:, None, None], out=src)
+        _divide_255(src, carry)
+
+        inside = (top >= 0) & (left >= 0) & (top + mh <= height) & (left + mw <= width)
+        whole = np.flatnonzero(inside)
+        if len(whole):
+            # Frames with the whole mask on the canvas are gathered, blended
+            # and scattered back together through a view of every mask-sized
+            # window of `out`; each frame selects one window, so the writes
+            # never overlap
+            strides = out.strides
+            windows = np.lib.stride_tricks.as_strided(
+                out, (frames, height - mh + 1, width - mw + 1, mh, mw),
+                (strides[0], strides[1], strides[2], strides[1], strides[2]))
+            index = (whole, top[whole], left[whole])
+            n = len(whole)
+            dst[:n] = windows[index]
+            _blend_over(dst[:n], src[whole], tmp[:n], carry[:n])
+            windows[index] = dst[:n]
+
+        for i in np.flatnonzero(~inside):
+            # Clip the mask's box to the frame
+            x0, y0 = max(left[i], 0), max(top[i], 0)
+            x1, y1 = min(left[i] + mw, width), min(top[i] + mh, height)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            region = out[i, y0:y1, x0:x1]
+            shape = region.shape
+            d = dst[i, :shape[0], :shape[1]]
+            d[...] = region
+            _blend_over(d, src[i, y0 - top[i]:y1 - top[i], x0 - left[i]:x1 - left[i]],
+                        tmp[i, :shape[0], :shape[1]], carry[i, :shape[0], :shape[1]])
+            region[...] = d
+
+
+class FieldLayer:
+    # A shape evaluated analytically on the pixel grid, positioned and
+    # rotated (radians, clockwise) per frame, within the box the shape can
+    # reach. Without animated geometry the shape is evaluated once and only
+    # its opacity changes.
+    def __init__(self, shape, x, y, rotation=0.0, opacity=1.0):
+        self.shape = shape
+        self.x = x
+        self.y = y
+        self.rotation = rotation
+        self.opacity = opacity
+        self.moving = any(callable(value) for value in (x, y, rotation))
+        self._static = None
+
+    def pixels(self):
+        side = 2 * math.ceil(self.shape.extent) + 2
+        return side * side
+
+    def render(self, out, times, scratch):
+        height, width = out.shape[1:]
+        x = evaluate(self.x, times).astype(np.float32)
+        y = evaluate(self.y, times).astype(np.float32)
+
+        # Pixels whose centres lie within `extent` of any frame's origin
+        extent = self.shape.extent
+        x0 = max(0, int(math.floor(x.min() - extent - 0.5)))
+        x1 = min(width, int(math.ceil(x.max() + extent + 0.5)) + 1)
+        y0 = max(0, int(math.floor(y.min() - extent - 0.5)))
+        y1 = min(height, int(math.ceil(y.max() + extent + 0.5)) + 1)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        if self.moving:
+            covered = self._coverage(times, x, y, x0, x1, y0, y1)
+        else:
+            if self._static is None:
+                self._static = self._coverage(times[:1], x[:1], y[:1], x0, x1, y0, y1)
+            covered = self._static
+
+        region = out[:, y0:y1, x0:x1]
+        dst, src, tmp, carry = scratch(region.shape)
+        np.multiply(covered, _opacity_levels(self.opacity, times)[:, None, None], out=src)
+        dst[...] = region
+        _blend_over(dst, src, tmp, carry)
+        region[...] = dst
+
+    def _coverage(self, times, x, y, x0, x1, y0, y1):
+        xs = np.arange(x0, x1, dtype=np.float32) + np.float32(0.5)
+        ys = np.arange(y0, y1, dtype=np.float32) + np.float32(0.5)
+        angle = evaluate(self.rotation, times).astype(np.float32)
+        sin_a = np.sin(angle)[:, None, None]
+        cos_a = np.cos(angle)[:, None, None]
+        dx = xs[None, None, :] - x[:, None, None]
+        dy = ys[None, :, None] - y[:, None, None]
+        return self.shape(dx * cos_a + dy * sin_a, dx * sin_a - dy * cos_a)
+
+
+class Scene:
+    # Layers drawn in order onto a transparent width x height canvas. The
+    # result is an alpha (coverage) stack with one frame per timestamp, which
+    # SpriteAnimation tints with a single colour.
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.layers = []
+        self._buffer = np.empty(0, dtype=np.uint16)
+
+    def add(self, layer):
+        self.layers.append(layer)
+        return self
+
+    def render(self, times, out=None, batch=None):
+        # Fills `out` (frames x height x width uint8) if given, `batch`
+        # timestamps at a time (default: as many as fit BATCH_PIXELS)
+        times = np.asarray(times, dtype=np.float64)
+        if out is None:
+            out = np.empty((len(times), self.height, self.width), dtype=np.uint8)
+        out[...] = 0
+        if not len(times):
+            return out
+        if batch is None:
+            largest = max([layer.pixels() for layer in self.layers] + [1])
+            batch = max(1, BATCH_PIXELS // min(largest, self.width * self.height))
+        batch = min(batch, len(times))
+
+        for start in range(0, len(times), batch):
+            chunk = slice(start, start + batch)
+            for layer in self.layers:
+                layer.render(out[chunk], times[chunk], self._scratch)
+        return out
+
+    def _scratch(self, shape):
+        # dst, src and two temporaries of `shape`, carved from one buffer
+        # that is reused by every layer and batch
+        size = 4 * math.prod(shape)
+        if self._buffer.size < size:
+            self._buffer = np.empty(size, dtype=np.uint16)
+        return self._buffer[:size].reshape((4,) + tuple(shape))
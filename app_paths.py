@@ -0,0 +1,20 @@
+import os
+import sys
+
+
+def get_app_dir():
+    # Get the directory of the running script/executable
+    if getattr(sys, 'frozen', False):
+        # Running as compiled executable
+        return os.path.dirname(sys.executable)
+    # Running as script
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def get_asset_dir():
+    # Get the directory holding bundled assets such as think.gif
+    if getattr(sys, 'frozen', False):
+        # Running as compiled executable
+        return sys._MEIPASS
+    # Running as script
+    return os.path.dirname(os.path.abspath(__file__))
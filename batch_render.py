@@ -0,0 +1,263 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app_paths import get_app_dir
+from encoder_profiles import DEFAULT_ENCODER, SELECTABLE_ENCODERS
+
+
+def load_jobs(path, questions=5):
+    # JSON: a list of jobs, each either {"facts": [...]} or
+    # {"category": 9, "questions": 5, "difficulty": "easy"}.
+    # CSV: either video,question,correct_answer rows (one video per distinct
+    # "video" value) or category,questions,difficulty rows.
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        jobs = data['jobs'] if isinstance(data, dict) else data
+        for job in jobs:
+            if 'facts' not in job:
+                job.setdefault('questions', questions)
+        return jobs
+
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    if rows and 'question' in rows[0]:
+        videos = {}
+        for row in rows:
+            videos.setdefault(row.get('video') or '1', []).append({
+                'question': row['question'],
+                'correct_answer': row['correct_answer']
+            })
+        return [{'name': name, 'facts': facts} for name, facts in videos.items()]
+
+    return [{
+        'category': int(row['category']) if row.get('category') else None,
+        'questions': int(row.get('questions') or questions),
+        'difficulty': row.get('difficulty') or None
+    } for row in rows]
+
+
+# Generator kept warm in each worker process between jobs
+_worker = None
+
+
+def _init_worker(engine, offline, slide_cache_dir=None, profile=False, encoder=DEFAULT_ENCODER, threads=None,
+                 vfr=False, renditions=None, segment_cache_mb=None, resume=False):
+    global _worker
+    from trivia_shorts_generator import TriviaVideoGenerator
+    from question_bank import QuestionBank
+    from render_cache import SlideCache
+
+    generator = TriviaVideoGenerator(profile=profile)
+    generator.encoder = encoder
+    generator.threads = threads
+    generator.vfr = vfr
+    if segment_cache_mb is not None:
+        generator.segment_cache_bytes = int(segment_cache_mb * 1024 * 1024)
+    if slide_cache_dir:
+        generator.slide_cache = SlideCache(disk_dir=slide_cache_dir)
+    generator.warm_up(engine)
+    _worker = {
+        'generator': generator,
+        'bank': QuestionBank(),
+        'engine': engine,
+        'offline': offline,
+        'renditions': renditions,
+        'resume': resume
+    }
+
+
+def _run_job(index, job, output_dir):
+    generator = _worker['generator']
+    start = time.perf_counter()
+
+    name = job.get('name') or f"video_{index + 1:04d}"
+    output_file = os.path.join(output_dir, f"trivia_{name}.mp4")
+
+    facts = job.get('facts')
+    if facts is None and _worker['resume'] and not _worker['renditions']:
+        # Questions drawn before the last run stopped
+        facts = generator.resumable_facts(output_file)
+    if facts is None:
+        facts = _worker['bank'].job_questions(job, offline=_worker['offline'])
+
+    if _worker['renditions']:
+        # Every rendition from one pass; the duration counts each of them
+        outputs = generator.generate_renditions(facts, _worker['renditions'], output_dir=output_dir,
+                                                name=f"trivia_{name}")
+        duration = generator.video_duration(len(facts)) * len(outputs)
+        return ", ".join(outputs.values()), duration, time.perf_counter() - start
+
+    generator.generate_video(facts, engine=_worker['engine'], output_file=output_file,
+                             resume=_worker['resume'])
+    return output_file, generator.video_duration(len(facts)), time.perf_counter() - start
+
+
+def _job_outputs(index, job, output_dir, renditions=None):
+    # Files a job writes; must match the names _run_job uses
+    name = f"trivia_{job.get('name') or f'video_{index + 1:04d}'}"
+    if renditions:
+        return [os.path.join(output_dir, f"{name}_{rendition}.mp4") for rendition in renditions]
+    return [os.path.join(output_dir, f"{name}.mp4")]
+
+
+def run_batch(jobs, output_dir, workers=None, engine='moviepy', offline=False, slide_cache_dir=None,
+              profile=False, encoder=DEFAULT_ENCODER, vfr=False, renditions=None, segment_cache_mb=None,
+              resume=False, pipeline=False):
+    from trivia_shorts_generator import TriviaVideoGenerator
+
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    # Each worker's encoder gets its share of the cores
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    # Render the shared countdown once before the workers start
+    generator = TriviaVideoGenerator()
+    generator.encoder = encoder
+    generator.get_countdown_segment(engine)
+
+    skipped = []
+    if resume:
+        # Videos a previous run finished are not rendered again
+        pending = []
+        for index, job in enumerate(jobs):
+            outputs = _job_outputs(index, job, output_dir, renditions)
+            if all(generator.render_finished(path) for path in outputs):
+                skipped.extend(outputs)
+            else:
+                pending.append((index, job))
+    else:
+        pending = list(enumerate(jobs))
+
+    start = time.perf_counter()
+    stages = None
+    if pipeline:
+        # Every stage in this process; the workers composite frames side by
+        # side and each segment is encoded by its own ffmpeg process
+        from question_bank import QuestionBank
+        from render_cache import SlideCache
+        from render_pipeline import RenderPipeline
+
+        generator.threads = threads
+        generator.vfr = vfr
+        if segment_cache_mb is not None:
+            generator.segment_cache_bytes = int(segment_cache_mb * 1024 * 1024)
+        if slide_cache_dir:
+            generator.slide_cache = SlideCache(disk_dir=slide_cache_dir)
+        bank = QuestionBank()
+        try:
+            stages = RenderPipeline(generator, bank, offline, composite_workers=workers, resume=resume).run(
+                [(index, job, _job_outputs(index, job, output_dir)[0]) for index, job in pending])
+        finally:
+            bank.close()
+        done, failed, seconds = stages.pop('outputs'), stages.pop('failed'), stages.pop('output_seconds')
+        stages.pop('wall_seconds')
+    else:
+        done, failed, seconds = _run_pool(pending, output_dir, workers, engine, offline, slide_cache_dir, profile,
+                                          encoder, threads, vfr, renditions, segment_cache_mb, resume)
+
+    wall = time.perf_counter() - start
+    return {
+        'videos': len(done),
+        'failed': len(failed),
+        'skipped': len(skipped),
+        'wall_seconds': wall,
+        'videos_per_minute': len(done) / wall * 60 if wall else 0.0,
+        'output_seconds': seconds,
+        'output_seconds_per_wall_second': seconds / wall if wall else 0.0,
+        'workers': workers,
+        'encoder': encoder,
+        'outputs': done + skipped,
+        'pipeline': stages
+    }
+
+
+def _run_pool(pending, output_dir, workers, engine, offline, slide_cache_dir, profile, encoder, threads, vfr,
+              renditions, segment_cache_mb, resume):
+    # One whole video per worker process at a time
+    done, failed, seconds = [], [], 0.0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(engine, offline, slide_cache_dir, profile, encoder, threads,
+                                       vfr, renditions, segment_cache_mb, resume)) as pool:
+        futures = {pool.submit(_run_job, i, job, output_dir): i for i, job in pending}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                output_file, duration, elapsed = future.result()
+            except Exception as e:
+                failed.append(index)
+                print(f"[{len(done) + len(failed)}/{len(pending)}] job {index + 1} failed: {str(e)}")
+                continue
+            done.append(output_file)
+            seconds += duration
+            print(f"[{len(done) + len(failed)}/{len(pending)}] {output_file} ({elapsed:.1f}s)")
+    return done, failed, seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render trivia videos in bulk without the GUI")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--jobs', help="JSON or CSV file describing the videos to render")
+    source.add_argument('--count', type=int, help="Number of videos to render from the question bank")
+    parser.add_argument('--category', type=int, help="OpenTDB category id used with --count")
+    parser.add_argument('--difficulty', choices=('easy', 'medium', 'hard'))
+    parser.add_argument('--questions', type=int, default=5, help="Questions per video (default: 5)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--engine', choices=('moviepy', 'pipe'), default='moviepy')
+    parser.add_argument('--encoder', choices=SELECTABLE_ENCODERS, default=DEFAULT_ENCODER,
+                        help=f"Encoder profile: speed vs. file size and quality (default: {DEFAULT_ENCODER})")
+    parser.add_argument('--output-dir', default=os.path.join(get_app_dir(), "batch_output"))
+    parser.add_argument('--offline', action='store_true', help="Only use questions already in the local bank")
+    parser.add_argument('--vfr', action='store_true',
+                        help="Encode static answer slides as held frames (variable frame rate)")
+    parser.add_argument('--renditions', nargs='+', choices=('short', 'landscape', 'square'),
+                        help="Render these sizes of every video in one pass (pipe engine)")
+    parser.add_argument('--slide-cache-dir', help="Keep rendered slides on disk between runs")
+    parser.add_argument('--segment-cache-mb', type=float,
+                        help="Disk budget for encoded segments reused between videos (default: 2048)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip videos a previous run finished and continue interrupted ones")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Overlap fetching, rasterizing, compositing and encoding in one process "
+                             "(pipe engine) and report how busy each stage was")
+    parser.add_argument('--profile', action='store_true',
+                        help="Write a JSON timing report next to every video")
+    args = parser.parse_args(argv)
+    if args.pipeline and (args.renditions or args.profile):
+        parser.error("--pipeline cannot be combined with --renditions or --profile")
+
+    if args.jobs:
+        jobs = load_jobs(args.jobs, args.questions)
+    else:
+        jobs = [{'category': args.category, 'questions': args.questions, 'difficulty': args.difficulty}
+                for _ in range(args.count)]
+
+    summary = run_batch(jobs, args.output_dir, args.workers, args.engine, args.offline,
+                        args.slide_cache_dir, args.profile, args.encoder, args.vfr, args.renditions,
+                        args.segment_cache_mb, args.resume, args.pipeline)
+
+    if summary['skipped']:
+        print(f"\nSkipped {summary['skipped']} videos finished by a previous run")
+    print(f"\nRendered {summary['videos']} videos ({summary['failed']} failed) "
+          f"with {summary['workers']} workers ({summary['encoder']} encoder) in {summary['wall_seconds']:.1f}s")
+    print(f"  {summary['videos_per_minute']:.2f} videos/min")
+    print(f"  {summary['output_seconds_per_wall_second']:.2f} seconds of output per wall-second")
+    if summary['pipeline']:
+        print(f"\n  {'stage':10s} {'workers':>7s} {'items':>7s} {'busy':>8s} {'blocked':>8s} {'util':>6s}")
+        for name, stage in summary['pipeline']['stages'].items():
+            print(f"  {name:10s} {stage['workers']:7d} {stage['items']:7d} {stage['busy_s']:7.1f}s "
+                  f"{stage['blocked_s']:7.1f}s {stage['utilization']:6.0%}")
+        print(f"\n  {'queue':10s} {'size':>7s} {'max':>7s} {'mean':>8s}")
+        for name, depth in summary['pipeline']['queues'].items():
+            print(f"  {name:10s} {depth['capacity']:7d} {depth['max_depth']:7d} {depth['mean_depth']:8.1f}")
+        print(f"\n  Slowest stage: {summary['pipeline']['bottleneck']}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import trivia_shorts_generator
+from trivia_shorts_generator import TriviaVideoGenerator
+
+
+def legacy_clock_frame(w, h, t, duration):
+    # The per-frame PIL implementation the frame bank replaced
+    surface = Image.new('RGBA', (w, h), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(surface)
+
+    margin = 10
+    draw.ellipse([margin, margin, w-margin, h-margin],
+                 outline=(255, 223, 0), width=3)
+
+    center = (w/2, h/2)
+    angle = (t / duration) * 2 * math.pi
+    hand_length = (w/2 - margin) * 0.8
+
+    end_x = center[0] + hand_length * math.sin(angle)
+    end_y = center[1] - hand_length * math.cos(angle)
+    draw.line([center, (end_x, end_y)], fill=(255, 223, 0), width=4)
+
+    dot_radius = 5
+    draw.ellipse([center[0]-dot_radius, center[1]-dot_radius,
+                  center[0]+dot_radius, center[1]+dot_radius],
+                 fill=(255, 223, 0))
+
+    frame = np.array(surface)
+    rgb = frame[..., :3]
+    alpha = frame[..., 3:] / 255.0
+    return rgb * alpha + (1 - alpha) * np.array([0, 0, 0])
+
+
+def main(countdowns=20):
+    generator = TriviaVideoGenerator()
+    w = h = int(generator.width * 0.2)
+    duration = 1
+    fps = generator.fps
+    times = [i / fps for i in range(duration * fps)]
+
+    start = time.perf_counter()
+    for _ in range(countdowns):
+        for t in times:
+            legacy_clock_frame(w, h, t, duration)
+    legacy = time.perf_counter() - start
+
+    trivia_shorts_generator._sprite_cache.clear()
+    start = time.perf_counter()
+    for _ in range(countdowns):
+        sprite = generator.clock_sprite(duration)
+        for t in times:
+            sprite.rgb_at(t)
+    banked = time.perf_counter() - start
+
+    frames = countdowns * len(times)
+    print(f"clock frames: {frames} ({w}x{h})")
+    print(f"  PIL per frame : {legacy:.3f}s  {frames / legacy:8.0f} fps")
+    print(f"  frame bank    : {banked:.3f}s  {frames / banked:8.0f} fps")
+    print(f"  speedup       : {legacy / banked:.1f}x")
+
+    # Sanity check that both renderers draw the same clock
+    clip = generator.create_clock_animation(duration)
+    mismatch = np.mean([
+        np.mean(np.any(clip.get_frame(t) != legacy_clock_frame(w, h, t, duration).astype(np.uint8), axis=-1))
+        for t in times
+    ])
+    print(f"  pixel mismatch: {mismatch * 100:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
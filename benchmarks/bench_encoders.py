@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from common import mean_difference
+from encoder_profiles import ENCODER_PROFILES, SELECTABLE_ENCODERS
+from trivia_shorts_generator import RENDER_ENGINES, TriviaVideoGenerator
+
+
+def render(generator, encoder, engine, facts, out_dir):
+    # Full generate_video run with a fresh countdown cache, so every profile
+    # encodes the same frames
+    generator.cache_dir = tempfile.mkdtemp(prefix="trivia_bench_cache_", dir=out_dir)
+    output_file = os.path.join(out_dir, f"{encoder}_{engine}.mp4")
+    start = time.perf_counter()
+    generator.generate_video(facts, engine=engine, output_file=output_file, encoder=encoder)
+    elapsed = time.perf_counter() - start
+    return {
+        'seconds': elapsed,
+        'fps': generator.last_render_stats['total_frames'] / elapsed,
+        'bytes': os.path.getsize(output_file),
+        'path': output_file
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encode time vs. file size for every encoder profile")
+    parser.add_argument('--scale', type=float, default=1.0, help="Resolution scale (1.0 = 1080x1920)")
+    parser.add_argument('--questions', type=int, default=2)
+    parser.add_argument('--engine', choices=RENDER_ENGINES, default='pipe')
+    parser.add_argument('--threads', type=int, default=None, help="Encoder threads (default: ffmpeg decides)")
+    parser.add_argument('--json', help="Also write the matrix to this file")
+    args = parser.parse_args()
+
+    with open(os.path.join(BENCH_DIR, "fixtures", "facts.json"), encoding='utf-8') as f:
+        facts = json.load(f)[:args.questions]
+
+    generator = TriviaVideoGenerator().scaled(args.scale)
+    generator.threads = args.threads
+    duration = generator.video_duration(len(facts))
+
+    out_dir = tempfile.mkdtemp(prefix="trivia_bench_")
+    try:
+        results = {encoder: render(generator, encoder, args.engine, facts, out_dir) for encoder in SELECTABLE_ENCODERS}
+        reference = results['archive']['path']
+        for result in results.values():
+            result['difference'] = mean_difference(result['path'], reference, samples=8)
+
+        print(f"{generator.width}x{generator.height} @ {generator.fps}fps, {len(facts)} questions "
+              f"({duration}s), {args.engine} engine")
+        print(f"  {'profile':10s} {'preset':>9s} {'crf':>4s} {'tune':>11s} {'time':>8s} {'fps':>7s} "
+              f"{'size':>9s} {'kbit/s':>8s} {'vs archive':>11s}")
+        for encoder, result in results.items():
+            settings = ENCODER_PROFILES[encoder]
+            print(f"  {encoder:10s} {settings['preset']:>9s} {settings['crf']:>4d} {settings['tune']:>11s} "
+                  f"{result['seconds']:7.2f}s {result['fps']:7.1f} "
+                  f"{result['bytes'] / 1024:7.0f}KB {result['bytes'] * 8 / 1000 / duration:8.0f} "
+                  f"{result['difference']:11.3f}")
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({encoder: {k: v for k, v in result.items() if k != 'path'}
+                           for encoder, result in results.items()}, f, indent=2)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
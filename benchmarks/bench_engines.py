@@ -0,0 +1,93 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import mean_difference
+from trivia_shorts_generator import RENDER_ENGINES, TriviaVideoGenerator, spans_to_clip
+
+
+def render(generator, engine, facts, out_dir):
+    # Render question + countdown + answer segments without the countdown
+    # cache so both engines do the same amount of work
+    frames = 0
+    start = time.perf_counter()
+    paths = []
+    for index, fact in enumerate(facts):
+        for kind, text in (('question', fact['question']), ('countdown', None),
+                           ('answer', fact['correct_answer'])):
+            path = os.path.join(out_dir, f"{engine}_{index:03d}_{kind}.mp4")
+            spans = generator.segment_spans(kind, text)
+            generator.write_spans(spans, path, engine)
+            frames += sum(int(round(d * generator.fps)) for _, d in spans)
+            paths.append(path)
+    return time.perf_counter() - start, frames, paths
+
+
+def generate_only(generator, facts):
+    # Frame production cost without the encoder: moviepy clip graph vs.
+    # iterating the spans directly
+    results = {}
+    for engine in RENDER_ENGINES:
+        frames = 0
+        start = time.perf_counter()
+        for fact in facts:
+            for kind, text in (('question', fact['question']), ('countdown', None),
+                               ('answer', fact['correct_answer'])):
+                spans = generator.segment_spans(kind, text)
+                if engine == 'pipe':
+                    for make_frame, duration in spans:
+                        for i in range(int(round(duration * generator.fps))):
+                            make_frame(i / generator.fps)
+                            frames += 1
+                else:
+                    clip = spans_to_clip(spans)
+                    for _ in clip.iter_frames(fps=generator.fps, dtype='uint8'):
+                        frames += 1
+                    clip.close()
+        results[engine] = frames / (time.perf_counter() - start)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the moviepy and raw-pipe render engines")
+    parser.add_argument('--scale', type=float, default=1.0, help="Resolution scale (1.0 = 1080x1920)")
+    parser.add_argument('--questions', type=int, default=2)
+    args = parser.parse_args()
+
+    generator = TriviaVideoGenerator().scaled(args.scale)
+    facts = [
+        {'question': f"Benchmark question number {i} about a fairly long topic?",
+         'correct_answer': f"Answer {i}"}
+        for i in range(args.questions)
+    ]
+
+    out_dir = tempfile.mkdtemp(prefix="trivia_bench_")
+    try:
+        results = {}
+        for engine in RENDER_ENGINES:
+            results[engine] = render(generator, engine, facts, out_dir)
+
+        print(f"{generator.width}x{generator.height} @ {generator.fps}fps, {args.questions} questions")
+        for engine, (elapsed, frames, _) in results.items():
+            print(f"  {engine:8s}: {elapsed:6.2f}s  {frames / elapsed:7.1f} fps")
+        base = results['moviepy'][0]
+        print(f"  pipe speedup: {base / results['pipe'][0]:.2f}x")
+
+        generated = generate_only(generator, facts)
+        print("  frame generation only (no encoder):")
+        for engine, fps in generated.items():
+            print(f"    {engine:8s}: {fps:9.1f} fps")
+
+        diff = max(mean_difference(a, b, samples=5) for a, b in zip(results['moviepy'][2], results['pipe'][2]))
+        print(f"  max mean abs pixel difference: {diff:.3f}")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
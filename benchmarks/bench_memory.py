@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from common import peak_rss_mb
+
+
+def open_handles():
+    # Open file descriptors (Linux/macOS); None where they cannot be listed
+    for path in ('/proc/self/fd', '/dev/fd'):
+        if os.path.isdir(path):
+            return len(os.listdir(path))
+    return None
+
+
+def facts(count):
+    with open(os.path.join(BENCH_DIR, "fixtures", "facts.json"), encoding='utf-8') as f:
+        fixture = json.load(f)
+    # Distinct text per question so no slide is shared between questions
+    return [{'question': f"{fixture[i % len(fixture)]['question']} (#{i + 1})",
+             'correct_answer': f"{fixture[i % len(fixture)]['correct_answer']} (#{i + 1})"}
+            for i in range(count)]
+
+
+def run_case(questions, scale, engine, slide_cache_mb):
+    # Runs inside its own process so peak RSS belongs to this render only
+    from trivia_shorts_generator import TriviaVideoGenerator
+    from render_cache import SlideCache
+
+    generator = TriviaVideoGenerator().scaled(scale)
+    generator.slide_cache = SlideCache(max_bytes=int(slide_cache_mb * 1024 * 1024))
+    out_dir = tempfile.mkdtemp(prefix="trivia_bench_")
+    generator.cache_dir = out_dir
+    try:
+        handles_before = open_handles()
+        generator.generate_video(facts(questions), engine=engine,
+                                 output_file=os.path.join(out_dir, "memory.mp4"))
+        return {
+            'questions': questions,
+            'peak_rss_mb': peak_rss_mb(),
+            'handles_before': handles_before,
+            'handles_after': open_handles(),
+            'slide_cache_mb': generator.slide_cache.bytes / (1024 * 1024)
+        }
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that peak memory and open handles do not grow with the question count")
+    parser.add_argument('--counts', type=int, nargs='+', default=[5, 50])
+    parser.add_argument('--scale', type=float, default=0.5, help="Resolution scale (1.0 = 1080x1920)")
+    parser.add_argument('--engine', choices=('moviepy', 'pipe'), default='pipe')
+    parser.add_argument('--slide-cache-mb', type=float, default=32,
+                        help="Memory budget of the slide cache during the check (default: 32)")
+    parser.add_argument('--tolerance-mb', type=float, default=25,
+                        help="Allowed peak RSS growth on top of the slide cache budget (default: 25)")
+    parser.add_argument('--case', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.scale, args.engine, args.slide_cache_mb)))
+        return 0
+
+    results = []
+    for count in args.counts:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', str(count),
+                               '--scale', str(args.scale), '--engine', args.engine,
+                               '--slide-cache-mb', str(args.slide_cache_mb)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{count} questions: failed\n{proc.stderr}")
+            return 1
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"{'questions':>9s} {'peak RSS':>10s} {'slide cache':>12s} {'handles':>12s}")
+    for result in results:
+        handles = (f"{result['handles_before']} -> {result['handles_after']}"
+                   if result['handles_after'] is not None else "n/a")
+        print(f"{result['questions']:9d} {result['peak_rss_mb']:8.0f}MB {result['slide_cache_mb']:10.1f}MB "
+              f"{handles:>12s}")
+
+    failures = []
+    base = results[0]
+    for result in results[1:]:
+        growth = result['peak_rss_mb'] - base['peak_rss_mb']
+        if growth > args.slide_cache_mb + args.tolerance_mb:
+            failures.append(f"peak RSS grew {growth:.0f}MB from {base['questions']} to "
+                            f"{result['questions']} questions")
+    for result in results:
+        if result['handles_after'] is not None and result['handles_after'] > result['handles_before']:
+            failures.append(f"{result['handles_after'] - result['handles_before']} handles left open "
+                            f"after {result['questions']} questions")
+
+    if failures:
+        print("\nFailed:")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    print("\nMemory and handles stay bounded")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
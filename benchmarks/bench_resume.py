@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+
+def load_facts(count):
+    with open(os.path.join(BENCH_DIR, "fixtures", "facts.json"), encoding='utf-8') as f:
+        return json.load(f)[:count]
+
+
+def make_generator(scale, cache_dir):
+    from trivia_shorts_generator import TriviaVideoGenerator
+
+    generator = TriviaVideoGenerator().scaled(scale)
+    generator.cache_dir = cache_dir
+    return generator
+
+
+def render(scale, cache_dir, output_file, facts=None):
+    generator = make_generator(scale, cache_dir)
+    start = time.perf_counter()
+    generator.generate_video(facts, engine='pipe', output_file=output_file, resume=True)
+    return time.perf_counter() - start, generator.last_segment_stats
+
+
+def frame_hashes(path):
+    # Decoded frames and their timestamps, so container details that do not
+    # change the picture are not compared
+    from trivia_shorts_generator import _ffmpeg_binary
+    result = subprocess.run([_ffmpeg_binary(), '-loglevel', 'error', '-i', path, '-f', 'framemd5', '-'],
+                            capture_output=True, text=True, check=True)
+    return [line for line in result.stdout.splitlines() if not line.startswith('#')]
+
+
+def kill_mid_render(args, cache_dir, output_file):
+    # Starts the render in its own process and kills it once part of the
+    # segments are finished; returns how many were
+    from render_manifest import RenderManifest, manifest_path
+
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--case', cache_dir, output_file,
+                             '--scale', str(args.scale), '--questions', str(args.questions)])
+    path = manifest_path(os.path.join(cache_dir, "manifests"), output_file)
+    target = args.kill_after
+    try:
+        while proc.poll() is None:
+            manifest = RenderManifest.load(path)
+            if manifest and len(manifest.completed) >= target and manifest.in_flight:
+                break
+            time.sleep(0.05)
+        else:
+            raise RuntimeError("The render finished before it could be killed")
+    finally:
+        if proc.poll() is None:
+            proc.send_signal(signal.SIGKILL if hasattr(signal, 'SIGKILL') else signal.SIGTERM)
+        proc.wait()
+    return len(RenderManifest.load(path).completed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Kill a resumable render mid-way, resume it and compare the output with a clean render")
+    parser.add_argument('--scale', type=float, default=0.25, help="Resolution scale (1.0 = 1080x1920)")
+    parser.add_argument('--questions', type=int, default=4)
+    parser.add_argument('--kill-after', type=int, default=5,
+                        help="Finished segments before the render is killed (default: 5)")
+    parser.add_argument('--case', nargs=2, metavar=('CACHE_DIR', 'OUTPUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        render(args.scale, args.case[0], args.case[1], load_facts(args.questions))
+        return 0
+
+    work_dir = tempfile.mkdtemp(prefix="trivia_bench_")
+    try:
+        reference = os.path.join(work_dir, "reference.mp4")
+        clean_seconds, _ = render(args.scale, os.path.join(work_dir, "clean_cache"), reference,
+                                  load_facts(args.questions))
+
+        cache_dir = os.path.join(work_dir, "resume_cache")
+        resumed = os.path.join(work_dir, "resumed.mp4")
+        finished = kill_mid_render(args, cache_dir, resumed)
+        # No questions given: they have to come from the manifest
+        resume_seconds, stats = render(args.scale, cache_dir, resumed)
+
+        print(f"clean render:   {clean_seconds:6.2f}s")
+        print(f"killed after {finished} segments, resumed in {resume_seconds:.2f}s "
+              f"({stats['rendered']} of {stats['segments']} segments rendered)")
+
+        failures = []
+        if frame_hashes(resumed) != frame_hashes(reference):
+            failures.append("resumed video differs from the clean render")
+        if stats['rendered'] >= stats['segments']:
+            failures.append("the resumed render reused no segments")
+        if os.path.exists(os.path.join(cache_dir, "manifests")) and os.listdir(os.path.join(cache_dir, "manifests")):
+            failures.append("manifest left behind after the resumed render finished")
+        with open(reference, 'rb') as a, open(resumed, 'rb') as b:
+            identical = a.read() == b.read()
+        print(f"output: {'byte-identical' if identical else 'same frames'} to the clean render")
+
+        if failures:
+            print("\nFailed:")
+            for line in failures:
+                print(f"  {line}")
+            return 1
+        print("\nResumed render matches")
+        return 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
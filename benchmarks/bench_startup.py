@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+# Modules that must not be imported before the first render
+HEAVY_MODULES = ('moviepy', 'imageio', 'imageio_ffmpeg', 'pygame', 'IPython', 'numpy', 'requests', 'PIL')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1000,
+                  'heavy': sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def measure(module):
+    # A fresh interpreter per run, so nothing is already imported
+    proc = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                          cwd=ROOT_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip())
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module, count):
+    # Cumulative microseconds per module from -X importtime
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                          cwd=ROOT_DIR, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the GUI module imports within the startup budget")
+    parser.add_argument('--module', default='trivia_gui', help="Module to import (default: trivia_gui)")
+    parser.add_argument('--budget-ms', type=float, default=250,
+                        help="Allowed median import time (default: 250)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    median = statistics.median(run['ms'] for run in runs)
+    heavy = runs[-1]['heavy']
+
+    print(f"import {args.module}: median {median:.0f}ms over {args.repeat} runs (budget {args.budget_ms:.0f}ms)")
+    print("  slowest imports (cumulative):")
+    for micros, name in slowest_imports(args.module, args.top):
+        print(f"    {micros / 1000:8.1f}ms  {name}")
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"import took {median:.0f}ms, over the {args.budget_ms:.0f}ms budget")
+    if heavy:
+        failures.append(f"heavy modules imported at startup: {', '.join(heavy)}")
+    if failures:
+        print("\nFailed:")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    print("\nStartup within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import argparse
+import html
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from question_bank import (RESPONSE_OK, RESPONSE_RATE_LIMIT, RESPONSE_TOKEN_EMPTY, RESPONSE_TOKEN_NOT_FOUND,
+                           QuestionBank)
+
+
+def load_facts():
+    with open(os.path.join(BENCH_DIR, "fixtures", "facts.json"), encoding='utf-8') as f:
+        facts = json.load(f)
+    for fact in facts:
+        fact.update(type='multiple', difficulty='easy')
+    return facts
+
+
+class StubOpenTDB(ThreadingHTTPServer):
+    # Stand-in for opentdb.com on a free loopback port. api.php answers with
+    # the queued response codes first, then with the queued result lists;
+    # every request is logged as (endpoint, params).
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.requests = []
+        self.request_times = []
+        self.codes = []
+        self.results = []
+        self.tokens = 0
+
+    def endpoint(self, name):
+        return [params for endpoint, params in self.requests if endpoint == name]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint = url.path.strip('/')
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        server = self.server
+        server.requests.append((endpoint, params))
+        server.request_times.append(time.monotonic())
+
+        if endpoint == 'api_token.php' and params.get('command') == 'request':
+            server.tokens += 1
+            data = {'response_code': RESPONSE_OK, 'token': f"token{server.tokens}"}
+        elif endpoint == 'api_token.php':
+            data = {'response_code': RESPONSE_OK, 'token': params.get('token')}
+        elif endpoint == 'api_category.php':
+            data = {'trivia_categories': [{'id': 9, 'name': "General Knowledge"}]}
+        elif endpoint == 'api.php' and server.codes:
+            data = {'response_code': server.codes.pop(0), 'results': []}
+        elif endpoint == 'api.php':
+            data = {'response_code': RESPONSE_OK, 'results': server.results.pop(0) if server.results else []}
+        else:
+            self.send_error(404)
+            return
+
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def recoded(fact):
+    # The same question as OpenTDB serves it on another day: entities
+    # decoded, different case and padding
+    return dict(fact, question=f" {html.unescape(fact['question']).upper()} ",
+                correct_answer=html.unescape(fact['correct_answer']).lower())
+
+
+def run_checks(server, work_dir):
+    facts = load_facts()
+    path = os.path.join(work_dir, "question_bank.sqlite3")
+    bank = QuestionBank(path, base_url=server.url, timeout=5, min_interval=0)
+    checks = []
+
+    def check(name, ok, detail=""):
+        checks.append((name, ok, detail))
+
+    # A token is requested on first use and kept in the store
+    server.results.append(facts[:2])
+    added = bank.fetch(2)
+    requested = [p for p in server.endpoint('api_token.php') if p.get('command') == 'request']
+    check("token requested once and sent", added == 2 and len(requested) == 1
+          and server.endpoint('api.php')[-1].get('token') == 'token1', f"added {added}, {len(requested)} tokens")
+
+    server.results.append(facts[2:3])
+    QuestionBank(path, base_url=server.url, timeout=5, min_interval=0).fetch(1)
+    requested = [p for p in server.endpoint('api_token.php') if p.get('command') == 'request']
+    check("stored token reused by a new bank", len(requested) == 1, f"{len(requested)} tokens")
+
+    # Code 3: the token expired and a new one is requested
+    server.codes.append(RESPONSE_TOKEN_NOT_FOUND)
+    server.results.append(facts[3:4])
+    added = bank.fetch(1)
+    check("token renewed after code 3", added == 1 and server.tokens == 2
+          and server.endpoint('api.php')[-1].get('token') == 'token2', f"added {added}, {server.tokens} tokens")
+
+    # Code 4: every question was served to this token; it is reset and the
+    # repeats the next request brings are skipped by their hash
+    server.codes.append(RESPONSE_TOKEN_EMPTY)
+    server.results.append([recoded(fact) for fact in facts[:4]] + facts[4:5])
+    added = bank.fetch(5)
+    resets = [p for p in server.endpoint('api_token.php') if p.get('command') == 'reset']
+    check("token reset after code 4", len(resets) == 1 and resets[0].get('token') == 'token2',
+          f"{len(resets)} resets")
+    check("repeats skipped by question_hash", added == 1 and bank.available() == 5,
+          f"added {added}, {bank.available()} stored")
+
+    # Code 5: rate limited, the same request is sent again
+    before = len(server.endpoint('api.php'))
+    server.codes.append(RESPONSE_RATE_LIMIT)
+    server.results.append([dict(facts[0], question="Which planet is known as the Red Planet?",
+                                correct_answer="Mars")])
+    added = bank.fetch(1)
+    check("request repeated after code 5", added == 1 and len(server.endpoint('api.php')) - before == 2,
+          f"added {added}, {len(server.endpoint('api.php')) - before} requests")
+
+    # Offline: only stored questions, without a single request
+    before = len(server.requests)
+    stored = bank.available()
+    taken = bank.get_questions(stored + 3, offline=True)
+    check("offline draws stored questions only", len(taken) == stored and len(server.requests) == before,
+          f"{len(taken)} of {stored} drawn, {len(server.requests) - before} requests")
+    try:
+        bank.job_questions({'questions': 1}, offline=True)
+        check("offline job fails once the store is used up", False, "no error")
+    except Exception as e:
+        check("offline job fails once the store is used up",
+              str(e) == "Only 0 of 1 questions available" and len(server.requests) == before, str(e))
+
+    # Banks in separate workers share the store, and with it the spacing
+    # OpenTDB enforces between requests
+    interval = 0.3
+    banks = [QuestionBank(path, base_url=server.url, timeout=5, min_interval=interval) for _ in range(2)]
+    before = len(server.request_times)
+    threads = [threading.Thread(target=b.categories, kwargs={'refresh': True}) for b in banks * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    times = server.request_times[before:]
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    check("requests from every bank spaced by min_interval", len(times) == 4 and min(gaps) >= interval * 0.9,
+          f"{len(times)} requests, gaps {', '.join(f'{gap:.2f}s' for gap in gaps)}")
+
+    for other in banks:
+        other.close()
+    bank.close()
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the question bank against a stand-in OpenTDB server")
+    parser.parse_args()
+
+    server = StubOpenTDB()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    work_dir = tempfile.mkdtemp(prefix="trivia_bank_check_")
+    try:
+        checks = run_checks(server, work_dir)
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for name, ok, detail in checks:
+        print(f"  {'ok' if ok else 'FAILED':6s} {name}" + (f" ({detail})" if detail and not ok else ""))
+    failed = [name for name, ok, _ in checks if not ok]
+    if failed:
+        print(f"\nFailed: {len(failed)} of {len(checks)} checks")
+        return 1
+    print(f"\nAll {len(checks)} question bank checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+import sys
+
+# Helpers shared by the benchmark scripts
+
+
+def mean_difference(a, b, samples=5):
+    # Largest mean absolute pixel difference between two videos over
+    # `samples` evenly spaced timestamps
+    import numpy as np
+    from moviepy.editor import VideoFileClip
+
+    clip_a, clip_b = VideoFileClip(a), VideoFileClip(b)
+    try:
+        times = np.linspace(0, min(clip_a.duration, clip_b.duration) - 0.1, samples)
+        return max(np.mean(np.abs(clip_a.get_frame(t).astype(int) - clip_b.get_frame(t).astype(int)))
+                   for t in times)
+    finally:
+        clip_a.close()
+        clip_b.close()
+
+
+def peak_rss_mb():
+    # Peak resident memory of this process, or None where the resource
+    # module is missing (Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from common import peak_rss_mb
+
+FIXTURE = os.path.join(BENCH_DIR, "fixtures", "facts.json")
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Metrics where a drop is a regression, and metrics where growth is
+HIGHER_IS_BETTER = ('fps', 'calls_per_s')
+LOWER_IS_BETTER = ('peak_rss_mb', 'output_mb')
+
+
+def load_facts():
+    with open(FIXTURE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def make_generator(scale, cache_dir):
+    from trivia_shorts_generator import TriviaVideoGenerator
+    from render_cache import SlideCache
+
+    generator = TriviaVideoGenerator()
+    if scale != 1.0:
+        generator = generator.scaled(scale)
+    generator.cache_dir = cache_dir
+    # Measure rasterization itself, not cache hits
+    generator.slide_cache = SlideCache(max_bytes=0)
+    return generator
+
+
+def time_frames(make_frame, duration, fps, repeat):
+    frames = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for i in range(int(round(duration * fps))):
+            make_frame(i / fps)
+            frames += 1
+    return {'fps': frames / (time.perf_counter() - start), 'frames': frames}
+
+
+def bench_text_image(generator, facts, repeat):
+    calls = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for fact in facts:
+            generator.create_text_image(fact['question'], color=generator.question_color)
+            generator.create_text_image(fact['correct_answer'], color=generator.answer_color)
+            calls += 2
+    return {'calls_per_s': calls / (time.perf_counter() - start), 'calls': calls}
+
+
+def bench_clock(generator, facts, repeat):
+    clip = generator.create_clock_animation(1)
+    return time_frames(clip.get_frame, 1, generator.fps, repeat * 5)
+
+
+def bench_fallback_think(generator, facts, repeat):
+    clip = generator._create_fallback_think_animation(generator.duration_per_question)
+    return time_frames(clip.get_frame, generator.duration_per_question, generator.fps, repeat)
+
+
+def bench_animation_sprites(generator, facts, repeat):
+    # Clock and fallback bubble frames built from scratch by the animation engine
+    clock = int(generator.short_side * 0.2)
+    clock_frames = int(round(generator.countdown_duration * generator.fps))
+    bubble_w, bubble_h = int(generator.short_side * 0.3), int(generator.short_side * 0.2)
+    frames = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        generator._build_clock_sprite(clock, clock, clock_frames, generator.countdown_duration)
+        generator._build_bubble_sprite(bubble_w, bubble_h)
+        frames += clock_frames + generator.fps
+    return {'fps': frames / (time.perf_counter() - start), 'frames': frames}
+
+
+def bench_countdown(generator, facts, repeat):
+    frames = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        clip = generator.create_countdown(generator.countdown_duration)
+        for _ in clip.iter_frames(fps=generator.fps, dtype='uint8'):
+            frames += 1
+        clip.close()
+    return {'fps': frames / (time.perf_counter() - start), 'frames': frames}
+
+
+def bench_think(generator, facts, repeat):
+    frames = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        clip = generator.create_think_animation(generator.duration_per_question)
+        for _ in clip.iter_frames(fps=generator.fps, dtype='uint8'):
+            frames += 1
+        clip.close()
+    return {'fps': frames / (time.perf_counter() - start), 'frames': frames}
+
+
+def bench_generate_video(generator, facts, repeat, engine='moviepy'):
+    out_dir = tempfile.mkdtemp(prefix="trivia_bench_")
+    try:
+        output_file = os.path.join(out_dir, "bench.mp4")
+        start = time.perf_counter()
+        generator.generate_video(facts, engine=engine, output_file=output_file)
+        elapsed = time.perf_counter() - start
+        frames = generator.last_render_stats['total_frames']
+        return {
+            'fps': frames / elapsed,
+            'frames': frames,
+            'seconds': elapsed,
+            'output_mb': os.path.getsize(output_file) / (1024 * 1024)
+        }
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+# name -> (function, resolution scale, repeat)
+CASES = {
+    'create_text_image': (bench_text_image, 1.0, 3),
+    'clock_make_frame': (bench_clock, 1.0, 3),
+    'fallback_think_make_frame': (bench_fallback_think, 1.0, 2),
+    'animation_sprites': (bench_animation_sprites, 1.0, 5),
+    'create_countdown': (bench_countdown, 1.0, 1),
+    'create_think_animation': (bench_think, 1.0, 1),
+    'generate_video_reduced': (bench_generate_video, 0.25, 1),
+    'generate_video_full': (bench_generate_video, 1.0, 1),
+}
+
+
+def run_case(name):
+    # Runs inside its own process so peak RSS belongs to this case only
+    func, scale, repeat = CASES[name]
+    cache_dir = tempfile.mkdtemp(prefix="trivia_bench_cache_")
+    try:
+        generator = make_generator(scale, cache_dir)
+        result = func(generator, load_facts(), repeat)
+        result['resolution'] = [generator.width, generator.height]
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def run_all(names):
+    results = {}
+    for name in names:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', name],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{name}: failed\n{proc.stderr}")
+            results[name] = {'error': proc.stderr.strip().splitlines()[-1:]}
+            continue
+        results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return results
+
+
+def compare(results, baseline, tolerance, partial=False):
+    regressions = []
+    if not partial:
+        # A case that was renamed or dropped must not leave the run green
+        for name in baseline.get('results', {}):
+            if name not in results:
+                regressions.append(f"{name}: in the baseline but not run")
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base or 'error' in result:
+            continue
+        for metric in HIGHER_IS_BETTER:
+            if metric in result and base.get(metric):
+                if result[metric] < base[metric] * (1 - tolerance):
+                    regressions.append(f"{name}.{metric}: {result[metric]:.1f} < baseline {base[metric]:.1f}")
+        for metric in LOWER_IS_BETTER:
+            if result.get(metric) and base.get(metric):
+                if result[metric] > base[metric] * (1 + tolerance):
+                    regressions.append(f"{name}.{metric}: {result[metric]:.1f} > baseline {base[metric]:.1f}")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'case':28s} {'resolution':>11s} {'rate':>14s} {'peak RSS':>10s} {'output':>9s}")
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"{name:28s} error")
+            continue
+        if 'fps' in result:
+            rate = f"{result['fps']:.1f} fps"
+        else:
+            rate = f"{result['calls_per_s']:.1f} calls/s"
+        rss = f"{result['peak_rss_mb']:.0f} MB" if result.get('peak_rss_mb') else "n/a"
+        output = f"{result['output_mb']:.2f} MB" if 'output_mb' in result else ""
+        resolution = "x".join(str(v) for v in result['resolution'])
+        print(f"{name:28s} {resolution:>11s} {rate:>14s} {rss:>10s} {output:>9s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the render pipeline")
+    parser.add_argument('cases', nargs='*', help=f"Cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    parser.add_argument('--baseline', default=BASELINE, help="Baseline file to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed relative slowdown/growth before failing (default: 0.25)")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case)))
+        return 0
+
+    names = args.cases or list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"Unknown cases: {', '.join(unknown)}")
+
+    results = run_all(names)
+    print_results(results)
+
+    report = {
+        'machine': platform.platform(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'results': results
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    # A crashed case fails the run whether or not there is a baseline
+    errors = [name for name, result in results.items() if 'error' in result]
+    if errors:
+        print(f"\nFailed cases: {', '.join(errors)}")
+
+    if args.save_baseline:
+        if errors:
+            print("Baseline not saved")
+            return 1
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline yet; run with --save-baseline to create one")
+        return 1 if errors else 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, partial=bool(args.cases))
+    if regressions:
+        print("\nRegressions against baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    if errors:
+        return 1
+    print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+# Named x264 settings for slide content: long GOPs since frames barely
+# change, `stillimage` for the static slides and `animation` when quality
+# matters more than size. Segments are encoded separately, so every segment
+# boundary already starts on a keyframe.
+ENCODER_PROFILES = {
+    'fast': {'preset': 'veryfast', 'crf': 26, 'tune': 'stillimage', 'keyframe_interval': 10,
+             'faststart': True},
+    'balanced': {'preset': 'medium', 'crf': 23, 'tune': 'stillimage', 'keyframe_interval': 5,
+                 'faststart': True},
+    'archive': {'preset': 'slow', 'crf': 18, 'tune': 'animation', 'keyframe_interval': 2,
+                'faststart': True},
+    # Used by preview()
+    'draft': {'preset': 'ultrafast', 'crf': 30, 'tune': 'stillimage', 'keyframe_interval': 10,
+              'faststart': False},
+}
+DEFAULT_ENCODER = 'balanced'
+# Profiles offered in the GUI, batch_render and the render server; 'draft'
+# is only for previews
+SELECTABLE_ENCODERS = tuple(name for name in ENCODER_PROFILES if name != 'draft')
+
+
+def encoder_params(encoder, fps):
+    # x264 output options for a profile, besides the preset and thread count
+    # which both writers pass separately
+    settings = ENCODER_PROFILES[encoder]
+    params = ['-crf', str(settings['crf'])]
+    if settings['tune']:
+        params += ['-tune', settings['tune']]
+    params += ['-g', str(max(1, int(round(settings['keyframe_interval'] * fps))))]
+    return params
@@ -0,0 +1,149 @@
+import threading
+
+from PIL import ImageFont
+
+
+class FontMetrics:
+    # One loaded font plus the glyph advances measured so far
+    def __init__(self, font):
+        self.font = font
+        self.size = getattr(font, 'size', None)
+        self.advances = {}
+        bbox = font.getbbox("hg")
+        self.text_height = bbox[3] - bbox[1]
+
+    def advance(self, char):
+        width = self.advances.get(char)
+        if width is None:
+            width = self.advances[char] = self.font.getlength(char)
+        return width
+
+    def width(self, text):
+        return sum(self.advance(char) for char in text)
+
+    def wrap(self, text, max_width):
+        # Greedy word wrap on pixel widths; words wider than a line are split
+        space = self.advance(' ')
+        lines = []
+        line, line_width = [], 0.0
+        for word in text.split():
+            word_width = self.width(word)
+            if word_width > max_width:
+                if line:
+                    lines.append(' '.join(line))
+                    line, line_width = [], 0.0
+                chunk, chunk_width = '', 0.0
+                for char in word:
+                    char_width = self.advance(char)
+                    if chunk and chunk_width + char_width > max_width:
+                        lines.append(chunk)
+                        chunk, chunk_width = '', 0.0
+                    chunk += char
+                    chunk_width += char_width
+                line, line_width = [chunk], chunk_width
+                continue
+
+            needed = word_width if not line else line_width + space + word_width
+            if line and needed > max_width:
+                lines.append(' '.join(line))
+                line, line_width = [word], word_width
+            else:
+                line.append(word)
+                line_width = needed
+        if line:
+            lines.append(' '.join(line))
+        return lines
+
+
+class FontRegistry:
+    # Loads every (font, size) once and keeps its metrics; falls back to
+    # Pillow's default font with a warning instead of failing silently
+    def __init__(self, fallbacks=("arial.ttf", "Arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf")):
+        self.fallbacks = fallbacks
+        self._init_state()
+
+    def _init_state(self):
+        self._resolved = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'fallbacks': self.fallbacks}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    def resolve(self, name):
+        # Find the first loadable font file for a name, or None for the
+        # built-in default
+        with self._lock:
+            if name in self._resolved:
+                return self._resolved[name]
+
+            resolved = None
+            for candidate in (name,) + tuple(f for f in self.fallbacks if f != name):
+                try:
+                    ImageFont.truetype(candidate, 12)
+                except OSError:
+                    continue
+                resolved = candidate
+                break
+
+            if resolved != name:
+                print(f"Warning: Could not load font {name} - using {resolved or 'default font'}")
+            self._resolved[name] = resolved
+            return resolved
+
+    def metrics(self, name, size):
+        key = (name, size)
+        metrics = self._metrics.get(key)
+        if metrics is not None:
+            return metrics
+
+        path = self.resolve(name)
+        if path:
+            font = ImageFont.truetype(path, size)
+        else:
+            try:
+                font = ImageFont.load_default(size)
+            except TypeError:
+                # Pillow without FreeType only has the fixed-size bitmap font
+                font = ImageFont.load_default()
+        metrics = FontMetrics(font)
+        with self._lock:
+            return self._metrics.setdefault(key, metrics)
+
+    def get(self, name, size):
+        return self.metrics(name, size).font
+
+    def fit(self, text, name, size, max_width, max_height, min_size=24, spacing=10):
+        # Largest size <= size whose wrapped text fits the box, with `spacing`
+        # pixels between lines; each size is measured from cached metrics
+        def layout(candidate):
+            metrics = self.metrics(name, candidate)
+            lines = metrics.wrap(text, max_width)
+            return metrics, lines
+
+        def height(candidate):
+            return (candidate[0].text_height + spacing) * len(candidate[1])
+
+        metrics, lines = layout(size)
+        if height((metrics, lines)) <= max_height or size <= min_size:
+            return metrics, lines
+
+        low, high = min_size, size - 1
+        best = layout(min_size)
+        while low <= high:
+            mid = (low + high) // 2
+            candidate = layout(mid)
+            if height(candidate) <= max_height:
+                best = candidate
+                low = mid + 1
+            else:
+                high = mid - 1
+        return best
+
+
+# Shared by every generator in the process
+default_font_registry = FontRegistry()
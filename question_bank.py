@@ -0,0 +1,358 @@
+import hashlib
+import html
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app_paths import get_app_dir
+
+OPENTDB_URL = 'https://opentdb.com'
+
+# OpenTDB response codes
+RESPONSE_OK = 0
+RESPONSE_NO_RESULTS = 1
+RESPONSE_INVALID_PARAMETER = 2
+RESPONSE_TOKEN_NOT_FOUND = 3
+RESPONSE_TOKEN_EMPTY = 4
+RESPONSE_RATE_LIMIT = 5
+
+# OpenTDB serves at most 50 questions per request
+MAX_BATCH = 50
+
+# Seconds the stored category list is used before it is fetched again
+CATEGORY_TTL = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    hash TEXT PRIMARY KEY,
+    category_id INTEGER,
+    category TEXT,
+    difficulty TEXT,
+    type TEXT,
+    question TEXT NOT NULL,
+    correct_answer TEXT NOT NULL,
+    incorrect_answers TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    used_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_questions_pick
+    ON questions (category_id, difficulty, used_at);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    base_url TEXT PRIMARY KEY,
+    token TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def question_hash(fact):
+    # Identifies a question regardless of how its HTML entities are encoded
+    text = html.unescape(fact['question']).strip().lower()
+    answer = html.unescape(fact['correct_answer']).strip().lower()
+    return hashlib.sha1(f"{text}\n{answer}".encode('utf-8')).hexdigest()
+
+
+class QuestionBank:
+    # Local SQLite store of OpenTDB questions. Videos draw unused questions
+    # from here, so generation never repeats a question and works offline;
+    # the network is only used to top the store up.
+    def __init__(self, path=None, base_url=OPENTDB_URL, timeout=10, min_interval=5.0):
+        self.path = path or os.path.join(get_app_dir(), "question_bank.sqlite3")
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        # OpenTDB allows one request per IP every five seconds; the spacing
+        # is kept in the store, so it holds across every process using it
+        self.min_interval = min_interval
+        self._request_lock = threading.Lock()
+        self._session = None
+        self._prefetch_thread = None
+        self._stop = threading.Event()
+
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _open(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        return db
+
+    @contextmanager
+    def _connect(self):
+        # Commit on success and always close the connection
+        db = self._open()
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @property
+    def session(self):
+        # One pooled session with retries for every request
+        if self._session is None:
+            session = requests.Session()
+            retry = Retry(total=3, backoff_factor=0.5,
+                          status_forcelist=(429, 500, 502, 503, 504),
+                          allowed_methods=('GET',))
+            adapter = HTTPAdapter(max_retries=retry, pool_maxsize=4)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    def _reserve_request(self):
+        # Claims the next free request slot for this server and returns when
+        # it starts; batch workers each have their own bank but one store
+        if self.min_interval <= 0:
+            return time.time()
+        key = f"last_request:{self.base_url}"
+        db = self._open()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            slot = now
+            # A slot far ahead means the clock was turned back; start over
+            if row and now < row['value'] + self.min_interval <= now + 3600:
+                slot = row['value'] + self.min_interval
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, slot))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return slot
+
+    def _get(self, endpoint, **params):
+        with self._request_lock:
+            wait = self._reserve_request() - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            response = self.session.get(f"{self.base_url}/{endpoint}", params=params,
+                                        timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.stop_prefetch()
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    # Categories
+
+    def categories(self, refresh=False, max_age=CATEGORY_TTL):
+        # Stored categories are reused until they are `max_age` seconds old;
+        # a stale list still beats none when the network is down
+        with self._connect() as db:
+            rows = db.execute("SELECT id, name FROM categories ORDER BY name").fetchall()
+            fetched = db.execute("SELECT value FROM meta WHERE key = 'categories_fetched_at'").fetchone()
+        fresh = fetched is not None and time.time() - fetched['value'] < max_age
+        if rows and fresh and not refresh:
+            return [dict(row) for row in rows]
+
+        try:
+            data = self._get('api_category.php')
+        except (requests.RequestException, ValueError):
+            if rows:
+                return [dict(row) for row in rows]
+            raise
+
+        categories = data['trivia_categories']
+        with self._connect() as db:
+            db.executemany("INSERT OR REPLACE INTO categories (id, name) VALUES (?, ?)",
+                           [(cat['id'], cat['name']) for cat in categories])
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('categories_fetched_at', ?)",
+                       (time.time(),))
+        return sorted(categories, key=lambda cat: cat['name'])
+
+    # Session tokens
+
+    def _token(self, renew=False):
+        with self._connect() as db:
+            row = db.execute("SELECT token FROM tokens WHERE base_url = ?",
+                             (self.base_url,)).fetchone()
+        if row and not renew:
+            return row['token']
+
+        data = self._get('api_token.php', command='request')
+        token = data['token']
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO tokens (base_url, token, created_at) VALUES (?, ?, ?)",
+                       (self.base_url, token, time.time()))
+        return token
+
+    def _reset_token(self, token):
+        self._get('api_token.php', command='reset', token=token)
+
+    # Fetching
+
+    def fetch(self, amount, category_id=None, difficulty=None):
+        # Download up to `amount` new questions into the store; returns how
+        # many were added
+        params = {'amount': min(amount, MAX_BATCH), 'type': 'multiple'}
+        if category_id:
+            params['category'] = category_id
+        if difficulty:
+            params['difficulty'] = difficulty
+
+        token = self._token()
+        for _ in range(3):
+            data = self._get('api.php', token=token, **params)
+            code = data.get('response_code')
+
+            if code == RESPONSE_OK:
+                return self.store(data['results'], category_id)
+            if code == RESPONSE_TOKEN_NOT_FOUND:
+                token = self._token(renew=True)
+            elif code == RESPONSE_TOKEN_EMPTY:
+                # Every question for this filter has been served to this
+                # token; start over and let the hash index skip duplicates
+                self._reset_token(token)
+            elif code == RESPONSE_RATE_LIMIT:
+                continue
+            elif code == RESPONSE_NO_RESULTS and params['amount'] > 1:
+                # Fewer questions left than requested
+                params['amount'] = max(1, params['amount'] // 2)
+            else:
+                break
+        return 0
+
+    def store(self, results, category_id=None):
+        now = time.time()
+        with self._connect() as db:
+            names = {row['name']: row['id'] for row in db.execute("SELECT id, name FROM categories")}
+            rows = []
+            for fact in results:
+                rows.append((
+                    question_hash(fact),
+                    category_id or names.get(html.unescape(fact.get('category', ''))),
+                    html.unescape(fact.get('category', '')),
+                    fact.get('difficulty'),
+                    fact.get('type'),
+                    fact['question'],
+                    fact['correct_answer'],
+                    json.dumps(fact.get('incorrect_answers', [])),
+                    now
+                ))
+            before = db.total_changes
+            db.executemany("""
+                INSERT OR IGNORE INTO questions
+                    (hash, category_id, category, difficulty, type, question,
+                     correct_answer, incorrect_answers, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            return db.total_changes - before
+
+    # Reading
+
+    def _filter(self, category_id, difficulty):
+        clauses, params = ["used_at IS NULL"], []
+        if category_id:
+            clauses.append("category_id = ?")
+            params.append(category_id)
+        if difficulty:
+            clauses.append("difficulty = ?")
+            params.append(difficulty)
+        return " AND ".join(clauses), params
+
+    def available(self, category_id=None, difficulty=None):
+        where, params = self._filter(category_id, difficulty)
+        with self._connect() as db:
+            return db.execute(f"SELECT COUNT(*) FROM questions WHERE {where}", params).fetchone()[0]
+
+    def take(self, amount, category_id=None, difficulty=None):
+        # Claim unused questions atomically so concurrent jobs never share one
+        where, params = self._filter(category_id, difficulty)
+        db = self._open()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            rows = db.execute(
+                f"SELECT * FROM questions WHERE {where} ORDER BY RANDOM() LIMIT ?",
+                params + [amount]
+            ).fetchall()
+            db.executemany("UPDATE questions SET used_at = ? WHERE hash = ?",
+                           [(time.time(), row['hash']) for row in rows])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        return [{
+            'category': row['category'],
+            'type': row['type'],
+            'difficulty': row['difficulty'],
+            'question': row['question'],
+            'correct_answer': row['correct_answer'],
+            'incorrect_answers': json.loads(row['incorrect_answers'])
+        } for row in rows]
+
+    def get_questions(self, amount, category_id=None, difficulty=None, offline=False):
+        # Top the store up from the network when it runs short, unless
+        # offline; whatever is stored locally is always usable
+        if not offline:
+            try:
+                for _ in range(3):
+                    missing = amount - self.available(category_id, difficulty)
+                    if missing <= 0 or not self.fetch(max(missing, MAX_BATCH), category_id, difficulty):
+                        break
+            except (requests.RequestException, ValueError, KeyError) as e:
+                print(f"Warning: Could not fetch questions - {str(e)}")
+        return self.take(amount, category_id, difficulty)
+
+    def job_questions(self, job, offline=False):
+        # Exactly job['questions'] questions for a render job's category and
+        # difficulty; every renderer fails a short job the same way
+        amount = job['questions']
+        facts = self.get_questions(amount, job.get('category'), job.get('difficulty'), offline=offline)
+        if len(facts) < amount:
+            raise Exception(f"Only {len(facts)} of {amount} questions available")
+        return facts
+
+    # Background prefetch
+
+    def prefetch(self, category_ids=(None,), target=MAX_BATCH, difficulty=None):
+        # Fill the store until every category has `target` unused questions
+        for category_id in category_ids:
+            while not self._stop.is_set() and self.available(category_id, difficulty) < target:
+                try:
+                    added = self.fetch(MAX_BATCH, category_id, difficulty)
+                except (requests.RequestException, ValueError, KeyError) as e:
+                    print(f"Warning: Question prefetch failed - {str(e)}")
+                    return
+                if not added:
+                    break
+
+    def start_prefetch(self, category_ids=(None,), target=MAX_BATCH, difficulty=None):
+        if self._prefetch_thread and self._prefetch_thread.is_alive():
+            return self._prefetch_thread
+        self._stop.clear()
+        self._prefetch_thread = threading.Thread(
+            target=self.prefetch, args=(tuple(category_ids), target, difficulty), daemon=True
+        )
+        self._prefetch_thread.start()
+        return self._prefetch_thread
+
+    def stop_prefetch(self):
+        self._stop.set()
+        if self._prefetch_thread:
+            self._prefetch_thread.join(timeout=self.timeout + self.min_interval)
+            self._prefetch_thread = None
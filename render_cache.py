@@ -0,0 +1,249 @@
+import glob
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+
+def content_key(*parts):
+    # Hash of everything that affects the rendered pixels
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def evict_lru(disk_dir, max_bytes, suffix, keep=()):
+    # Deletes the least recently used <key><suffix> files under disk_dir
+    # (reads touch them) until the rest fit in max_bytes; keys in `keep`
+    # stay. Returns the bytes left.
+    files = []
+    for root, _, names in os.walk(disk_dir):
+        for name in names:
+            key = name[:-len(suffix)]
+            # Temporary files carry the writer's pid after the key
+            if not name.endswith(suffix) or '.' in key or key in keep:
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    return total
+
+
+class SlideCache:
+    # In-memory LRU of rendered slides (read-only uint8 arrays) with an
+    # optional on-disk PNG store, both evicted by size
+    def __init__(self, max_bytes=256 * 1024 * 1024, disk_dir=None, max_disk_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._init_state()
+
+    def _init_state(self):
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # Only the configuration travels to worker processes
+        return {
+            'max_bytes': self.max_bytes,
+            'disk_dir': self.disk_dir,
+            'max_disk_bytes': self.max_disk_bytes
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    @property
+    def bytes(self):
+        # Memory held by the in-memory tier
+        return self._bytes
+
+    def get_or_render(self, key, render):
+        slide = self.get(key)
+        if slide is None:
+            slide = self.put(key, render())
+        return slide
+
+    def get(self, key):
+        with self._lock:
+            slide = self._entries.get(key)
+            if slide is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return slide
+
+        slide = self._load(key)
+        if slide is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self._remember(key, slide)
+        return slide
+
+    def put(self, key, image):
+        slide = np.array(image, dtype=np.uint8)
+        slide.setflags(write=False)
+        self._remember(key, slide)
+        self._store(key, slide)
+        return slide
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remember(self, key, slide):
+        if slide.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = slide
+            self._bytes += slide.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.png")
+
+    def _load(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with Image.open(path) as image:
+                slide = np.array(image.convert('RGB'))
+            # Touch the file so disk eviction is least-recently-used
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        slide.setflags(write=False)
+        return slide
+
+    def _store(self, key, slide):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            Image.fromarray(slide).save(temp_path, format='PNG')
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not store slide in cache - {str(e)}")
+            return
+        self._evict_disk(os.path.getsize(path))
+
+    def _evict_disk(self, added):
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += added
+                if self._disk_bytes <= self.max_disk_bytes:
+                    return
+            self._disk_bytes = evict_lru(self.disk_dir, self.max_disk_bytes, '.png')
+
+
+# Shared by every generator in the process unless one is given its own
+default_slide_cache = SlideCache()
+
+
+class SegmentCache:
+    # On-disk store of encoded video segments keyed by content_key() of
+    # everything that affects them. Segments are written to a temporary file
+    # and renamed, so a stored segment is always complete; the least
+    # recently used are evicted once the store outgrows max_bytes.
+    def __init__(self, disk_dir, max_bytes=2 * 1024 * 1024 * 1024):
+        self.disk_dir = disk_dir
+        self.max_bytes = max_bytes
+        self._init_state()
+
+    def _init_state(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # Only the configuration travels to worker processes
+        return {'disk_dir': self.disk_dir, 'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    def path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.mp4")
+
+    def get(self, key):
+        # Path of the stored segment, or None
+        path = self.path(key)
+        try:
+            # Touch the file so eviction is least-recently-used
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key, render):
+        # `render(path)` encodes the segment to the given path
+        temp_path = self.temp_path(key)
+        try:
+            render(temp_path)
+            return self.commit(key, temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def temp_path(self, key):
+        # Where a segment is encoded before commit() moves it into place
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path[:-4]}.{os.getpid()}.{threading.get_ident()}.part.mp4"
+
+    def commit(self, key, temp_path):
+        path = self.path(key)
+        os.replace(temp_path, path)
+        return path
+
+    def evict(self, keep=()):
+        # Called between videos rather than after every segment, so nothing
+        # a video still has to join is removed while it renders; segments
+        # whose keys are in `keep` are never removed
+        for path in glob.glob(os.path.join(glob.escape(self.disk_dir), '*', '*.part.mp4')):
+            self._remove_stale_part(path)
+        return evict_lru(self.disk_dir, self.max_bytes, '.mp4', keep)
+
+    def _remove_stale_part(self, path, max_age=3600):
+        # Left behind by an encoder that outlived a killed render
+        try:
+            if time.time() - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            pass
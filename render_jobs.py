@@ -0,0 +1,168 @@
+import datetime
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+
+from app_paths import get_app_dir
+from render_progress import RenderCancelled
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+def _run_job(job_id, job, events, cancel):
+    # Runs in its own process; everything it has to say goes through
+    # `events` as (job_id, kind, value) tuples
+    def report(percentage, message):
+        # The pipe engine also reports from ffmpeg's reader thread; only the
+        # render thread may stop the render
+        if cancel.is_set() and threading.current_thread() is threading.main_thread():
+            raise RenderCancelled()
+        events.put((job_id, 'progress', (percentage, message)))
+
+    try:
+        from question_bank import QuestionBank
+        from trivia_shorts_generator import TriviaVideoGenerator
+
+        facts = job.get('facts')
+        if facts is None:
+            report(0, "Fetching questions...")
+            bank = QuestionBank()
+            try:
+                facts = bank.job_questions(job)
+            finally:
+                bank.close()
+            events.put((job_id, 'facts', facts))
+
+        generator = TriviaVideoGenerator()
+        output_file = job.get('output_file')
+        if output_file is None:
+            # Jobs started in the same poll() share a timestamp; the job id
+            # keeps their files apart
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            if job.get('preview'):
+                output_file = os.path.join(tempfile.gettempdir(), f"trivia_preview_{timestamp}_{job_id}.mp4")
+            else:
+                output_file = os.path.join(get_app_dir(), f"trivia_video_{timestamp}_{job_id}.mp4")
+        if job.get('preview'):
+            generator = generator.preview()
+            output_file = generator.generate_video(facts, report, engine='pipe', output_file=output_file)
+        else:
+            output_file = generator.generate_video(facts, report, engine=job.get('engine', 'moviepy'),
+                                                   output_file=output_file, encoder=job.get('encoder'))
+        events.put((job_id, DONE, output_file))
+    except RenderCancelled:
+        events.put((job_id, CANCELLED, None))
+    except Exception as e:
+        events.put((job_id, CANCELLED if cancel.is_set() else FAILED, str(e)))
+
+
+class RenderJobQueue:
+    # Renders queued jobs in up to `workers` background processes. Nothing
+    # here touches a UI: the owner calls poll() from its own loop and gets
+    # back the (job_id, kind, value) events that arrived since the last call.
+    def __init__(self, workers=1, cancel_grace=5.0):
+        # Spawned, not forked: the parent may be running Tk
+        self._context = multiprocessing.get_context('spawn')
+        self._events = self._context.Queue()
+        self.workers = workers
+        # Seconds a cancelled job gets to stop by itself before it is killed
+        self.cancel_grace = cancel_grace
+        self.jobs = OrderedDict()
+        self._pending = deque()
+        self._running = {}
+        self._next_id = 1
+
+    def submit(self, job):
+        job_id = self._next_id
+        self._next_id += 1
+        self.jobs[job_id] = {'job': job, 'state': QUEUED, 'progress': 0.0, 'message': "Queued",
+                             'result': None}
+        self._pending.append(job_id)
+        return job_id
+
+    def cancel(self, job_id):
+        info = self.jobs.get(job_id)
+        if info is None:
+            return
+        if info['state'] == QUEUED:
+            self._pending.remove(job_id)
+            self._finish(job_id, CANCELLED, None)
+        elif job_id in self._running:
+            process, cancel, cancelled_at = self._running[job_id]
+            if cancelled_at is None:
+                cancel.set()
+                self._running[job_id] = (process, cancel, time.monotonic())
+                info['message'] = "Cancelling..."
+
+    def active(self):
+        return bool(self._pending or self._running)
+
+    def poll(self):
+        # Workers found dead before draining have flushed all their events
+        exited = [job_id for job_id, (process, _, _) in self._running.items() if not process.is_alive()]
+
+        events = []
+        while True:
+            try:
+                job_id, kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            events.append((job_id, kind, value))
+            info = self.jobs[job_id]
+            if kind == 'progress':
+                info['progress'], info['message'] = value
+            elif kind in (DONE, FAILED, CANCELLED):
+                self._finish(job_id, kind, value)
+
+        for job_id in exited:
+            process, _, cancelled_at = self._running.pop(job_id)
+            process.join()
+            if self.jobs[job_id]['state'] == RUNNING:
+                # Exited without a final event: killed or crashed
+                state = CANCELLED if cancelled_at is not None else FAILED
+                self._finish(job_id, state, f"Worker exited with code {process.exitcode}")
+                events.append((job_id, state, self.jobs[job_id]['result']))
+
+        now = time.monotonic()
+        for process, _, cancelled_at in self._running.values():
+            if cancelled_at is not None and now - cancelled_at > self.cancel_grace:
+                process.terminate()
+
+        while self._pending and len(self._running) < self.workers:
+            job_id = self._pending.popleft()
+            cancel = self._context.Event()
+            process = self._context.Process(target=_run_job,
+                                            args=(job_id, self.jobs[job_id]['job'], self._events, cancel),
+                                            daemon=True)
+            process.start()
+            self._running[job_id] = (process, cancel, None)
+            self.jobs[job_id].update(state=RUNNING, message="Starting...")
+            events.append((job_id, RUNNING, None))
+        return events
+
+    def _finish(self, job_id, state, result):
+        info = self.jobs[job_id]
+        info['state'] = state
+        info['result'] = result
+        if state == DONE:
+            info['progress'], info['message'] = 100.0, "Done"
+        else:
+            info['message'] = "Cancelled" if state == CANCELLED else "Failed"
+
+    def shutdown(self):
+        for job_id in list(self._pending):
+            self.cancel(job_id)
+        for process, cancel, _ in self._running.values():
+            cancel.set()
+            process.terminate()
+            process.join(timeout=self.cancel_grace)
+        self._running.clear()
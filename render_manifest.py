@@ -0,0 +1,147 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Manifest states
+RENDERING = 'rendering'
+JOINING = 'joining'
+
+
+def manifest_path(manifest_dir, output_file):
+    # One manifest per output file, wherever the render is started from
+    name = hashlib.sha1(os.path.abspath(output_file).encode('utf-8')).hexdigest()
+    return os.path.join(manifest_dir, f"{name}.json")
+
+
+class RenderManifest:
+    # Progress of one resumable render: the questions it draws, the segment
+    # keys of its plan, which segments are finished and which were being
+    # encoded. Saved after every change, so a render killed at any point
+    # leaves a manifest that describes it.
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return cls(path, json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def create(cls, path, output_file, facts, keys):
+        manifest = cls(path, {
+            'output_file': os.path.abspath(output_file),
+            'facts': facts,
+            'segments': keys,
+            'completed': {},
+            'in_flight': {},
+            'state': RENDERING,
+            'started_at': time.time()
+        })
+        manifest.save()
+        return manifest
+
+    @property
+    def facts(self):
+        return self.data['facts']
+
+    @property
+    def completed(self):
+        return self.data['completed']
+
+    @property
+    def in_flight(self):
+        return self.data['in_flight']
+
+    def matches(self, keys):
+        return self.data['segments'] == keys
+
+    def start(self, key):
+        with self._lock:
+            self.data['in_flight'][key] = {'pid': os.getpid(), 'started_at': time.time()}
+            self._save()
+
+    def finish(self, key, path):
+        with self._lock:
+            self.data['in_flight'].pop(key, None)
+            self.data['completed'][key] = path
+            self._save()
+
+    def set_state(self, state):
+        with self._lock:
+            self.data['state'] = state
+            self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f)
+        os.replace(temp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _process_alive(pid):
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        # PROCESS_QUERY_LIMITED_INFORMATION; exit code 259 is STILL_ACTIVE
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == 259
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def clear_partial_segments(segment_paths):
+    # Temporary files (<key>.<pid>.<thread>.part.mp4) of segments that were
+    # being encoded when a render died; finished segments are always renamed
+    # into place. Another worker may be encoding the same segment right now,
+    # so files whose process is still alive are left alone.
+    for path in segment_paths:
+        prefix = path[:-4]
+        for partial in glob.glob(f"{glob.escape(prefix)}.*.part.mp4"):
+            pid = partial[len(prefix) + 1:].split('.', 1)[0]
+            if pid.isdigit() and _process_alive(int(pid)):
+                continue
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+
+
+def pinned_segments(manifest_dir):
+    # Keys of the finished segments of every unfinished render, which the
+    # segment cache must keep until those renders are resumed
+    keys = set()
+    for path in glob.glob(os.path.join(glob.escape(manifest_dir), "*.json")):
+        manifest = RenderManifest.load(path)
+        if manifest is not None:
+            keys.update(manifest.completed)
+    return keys
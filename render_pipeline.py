@@ -0,0 +1,393 @@
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from render_manifest import JOINING
+from trivia_shorts_generator import concat_segments
+
+# Ends a stage's input; the last worker of a stage passes it on
+_END = object()
+
+# Seconds the current thread has spent blocked on full queues, so a stage's
+# busy time leaves out waiting for the next stage
+_blocked = threading.local()
+
+
+def _blocked_seconds():
+    return getattr(_blocked, 'seconds', 0.0)
+
+
+class StageQueue(queue.Queue):
+    # Bounded queue between two stages that records how full it runs and how
+    # long producers were blocked on it, i.e. backpressure from the consumer
+    def __init__(self, name, maxsize):
+        super().__init__(maxsize)
+        self.name = name
+        self._stats_lock = threading.Lock()
+        self.puts = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self.blocked_seconds = 0.0
+
+    def put(self, item, block=True, timeout=None):
+        start = time.perf_counter()
+        super().put(item, block, timeout)
+        blocked = time.perf_counter() - start
+        _blocked.seconds = _blocked_seconds() + blocked
+        depth = self.qsize()
+        with self._stats_lock:
+            self.puts += 1
+            self.depth_total += depth
+            self.max_depth = max(self.max_depth, depth)
+            self.blocked_seconds += blocked
+
+    def metrics(self):
+        return {
+            'capacity': self.maxsize,
+            'max_depth': self.max_depth,
+            'mean_depth': self.depth_total / self.puts if self.puts else 0.0,
+            'producer_blocked_s': self.blocked_seconds
+        }
+
+
+class Stage:
+    # `workers` threads handing every item of `inbox` to `work`. Errors go to
+    # `on_error` so one bad item does not stop the stage; once the inbox is
+    # drained, `outbox` gets the end marker.
+    def __init__(self, name, work, inbox, outbox=None, workers=1, on_error=None):
+        self.name = name
+        self.work = work
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.on_error = on_error
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self._lock = threading.Lock()
+        self._running = workers
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _END:
+                # Left for the stage's other workers
+                self.inbox.put(_END)
+                break
+            start = time.perf_counter()
+            blocked = _blocked_seconds()
+            try:
+                self.work(item)
+            except Exception as e:
+                if self.on_error is None:
+                    raise
+                self.on_error(item, e)
+            blocked = _blocked_seconds() - blocked
+            with self._lock:
+                self.items += 1
+                self.busy_seconds += time.perf_counter() - start - blocked
+                self.blocked_seconds += blocked
+
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last and self.outbox is not None:
+            self.outbox.put(_END)
+
+    def metrics(self, wall_seconds):
+        return {
+            'workers': self.workers,
+            'items': self.items,
+            'busy_s': self.busy_seconds,
+            'blocked_s': self.blocked_seconds,
+            'utilization': self.busy_seconds / (wall_seconds * self.workers) if wall_seconds else 0.0
+        }
+
+
+class VideoJob:
+    # One output video moving through the pipeline; `paths` fills up as its
+    # segments are found in the cache or finish encoding. Resumable videos
+    # record them in a manifest as well.
+    def __init__(self, index, job, output_file):
+        self.index = index
+        self.job = job
+        self.output_file = output_file
+        self.facts = None
+        self.manifest = None
+        self.plan = None
+        self.paths = None
+        self.remaining = 0
+        self.error = None
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def resolve(self, index, path):
+        # True once every segment is resolved
+        with self._lock:
+            self.paths[index] = path
+            self.remaining -= 1
+            return self.remaining == 0
+
+
+class SegmentTask:
+    # One distinct segment being composited and encoded, and every
+    # (video, plan index) waiting for it
+    def __init__(self, key):
+        self.key = key
+        self.spans = None
+        self.held_frames = 0
+        self.waiters = []
+        self.writer = None
+        self.temp_path = None
+        self.error = None
+        self.done = False
+
+
+class RenderPipeline:
+    # Batch renderer made of stages joined by bounded queues:
+    #
+    #   fetch -> rasterize -> composite -> encode -> join
+    #
+    # fetch draws questions from the bank, rasterize lays out slides and looks
+    # segments up in the segment cache, composite produces frames, encode
+    # streams them into one ffmpeg process per segment and join concatenates
+    # finished videos. The stages run at the same time, so throughput is
+    # limited by the slowest stage instead of the sum of all of them. Segments
+    # shared between videos (the countdown, repeated answers) are encoded once.
+    # With resume=True every video keeps a manifest like
+    # generate_video(resume=True), so an interrupted batch picks up its
+    # questions and finished segments.
+    def __init__(self, generator, bank=None, offline=False, queue_size=4, frame_queue_size=8,
+                 fetch_workers=1, composite_workers=1, resume=False):
+        self.generator = generator
+        self.bank = bank
+        self.offline = offline
+        self.resume = resume
+        self.queue_size = queue_size
+        self.frame_queue_size = frame_queue_size
+        self.fetch_workers = fetch_workers
+        self.composite_workers = composite_workers
+        self._tasks = {}
+        self._tasks_lock = threading.Lock()
+        self._results_lock = threading.Lock()
+
+    def run(self, jobs, progress=print):
+        # jobs: (index, job, output_file) tuples. Returns the finished and
+        # failed videos and per-stage metrics.
+        self.done, self.failed, self.seconds = [], [], 0.0
+        self._total = len(jobs)
+        self._progress = progress
+
+        queues = [
+            StageQueue('jobs', 0),
+            StageQueue('fetched', self.queue_size),
+            StageQueue('segments', self.queue_size),
+            StageQueue('frames', self.frame_queue_size),
+            StageQueue('videos', self.queue_size),
+        ]
+        jobs_q, self._fetched, self._segments, self._frames, self._videos = queues
+        stages = [
+            Stage('fetch', self._fetch, jobs_q, self._fetched, self.fetch_workers, self._fetch_failed),
+            Stage('rasterize', self._rasterize, self._fetched, self._segments, 1),
+            Stage('composite', self._composite, self._segments, self._frames, self.composite_workers,
+                  self._composite_failed),
+            # One thread owns every open ffmpeg writer, so each segment's
+            # frames stay in order
+            Stage('encode', self._encode, self._frames, self._videos, 1, self._encode_failed),
+            Stage('join', self._join, self._videos, None, 1, self._join_failed),
+        ]
+
+        start = time.perf_counter()
+        for stage in stages:
+            stage.start()
+        for item in jobs:
+            jobs_q.put(item)
+        jobs_q.put(_END)
+        for stage in stages:
+            stage.join()
+        wall = time.perf_counter() - start
+
+        # Only between runs: videos still in flight need their segments
+        self.generator.evict_segments()
+
+        stage_metrics = {stage.name: stage.metrics(wall) for stage in stages}
+        return {
+            'outputs': self.done,
+            'failed': self.failed,
+            'output_seconds': self.seconds,
+            'wall_seconds': wall,
+            'stages': stage_metrics,
+            'queues': {q.name: q.metrics() for q in queues[1:]},
+            'bottleneck': max(stage_metrics, key=lambda name: stage_metrics[name]['utilization'])
+        }
+
+    # Stages
+
+    def _fetch(self, item):
+        index, job, output_file = item
+        video = VideoJob(index, job, output_file)
+        facts = job.get('facts')
+        if facts is None and self.resume:
+            # Questions drawn before the last run stopped
+            facts = self.generator.resumable_facts(output_file)
+        if facts is None:
+            facts = self.bank.job_questions(job, offline=self.offline)
+        video.facts = facts
+        video.plan = self.generator.video_plan(facts)
+        if self.resume:
+            video.manifest = self.generator.open_manifest(output_file, facts, video.plan)
+        video.paths = [None] * len(video.plan)
+        video.remaining = len(video.plan)
+        self._fetched.put(video)
+
+    def _rasterize(self, video):
+        for index, (kind, text) in enumerate(video.plan):
+            try:
+                task = self._claim(video, index, kind, text)
+            except Exception as e:
+                video.error = video.error or e
+                self._resolve(video, index, None)
+                continue
+            if task is None:
+                continue
+            try:
+                # Slides are rasterized (or found in the slide cache) here
+                task.spans = self.generator.segment_spans(kind, text)
+            except Exception as e:
+                self._finish_task(task, error=e)
+                continue
+            self._segments.put(task)
+
+    def _composite(self, task):
+        frames, task.held_frames = self.generator.segment_frames(task.spans)
+        task.spans = None
+        for frame in frames:
+            # Compositors reuse one buffer, so every queued frame is a copy
+            self._frames.put((task, np.array(frame)))
+        self._frames.put((task, None))
+
+    def _encode(self, item):
+        task, frame = item
+        if task.done:
+            return
+        if frame is None and task.error is not None:
+            # Compositing failed part-way
+            self._discard_writer(task)
+            self._finish_task(task, error=task.error)
+            return
+        if task.writer is None:
+            task.temp_path = self.generator.segment_cache.temp_path(task.key)
+            task.writer = self.generator.segment_writer(task.temp_path, task.held_frames)
+        if frame is not None:
+            task.writer.write_frame(frame)
+            return
+        task.writer.close()
+        task.writer = None
+        path = self.generator.segment_cache.commit(task.key, task.temp_path)
+        self._finish_task(task, path)
+
+    def _join(self, video):
+        if video.error is not None:
+            raise video.error
+        generator = self.generator
+        durations = [generator.segment_duration(kind) for kind, _ in video.plan] if generator.vfr else None
+        if video.manifest:
+            video.manifest.set_state(JOINING)
+        concat_segments(video.paths, video.output_file, generator.encoder_settings['faststart'], durations)
+        if video.manifest:
+            video.manifest.remove()
+        with self._results_lock:
+            self.done.append(video.output_file)
+            self.seconds += generator.video_duration(len(video.facts))
+            self._report(f"{video.output_file} ({time.perf_counter() - video.started:.1f}s)")
+
+    # Bookkeeping
+
+    def _claim(self, video, index, kind, text):
+        # Resolves the segment from the cache, or queues the video behind the
+        # task producing it; returns a new task this video has to render
+        key = self.generator.segment_key(kind, text)
+        new = False
+        with self._tasks_lock:
+            task = self._tasks.get(key)
+            if task is None:
+                path = self.generator.segment_cache.get(key)
+                if path is None:
+                    task = self._tasks[key] = SegmentTask(key)
+                    new = True
+            if task is not None:
+                # Already on its way for this or another video, or new
+                task.waiters.append((video, index))
+                if video.manifest:
+                    video.manifest.start(key)
+                return task if new else None
+        if video.manifest and key not in video.manifest.completed:
+            video.manifest.finish(key, path)
+        self._resolve(video, index, path)
+        return None
+
+    def _resolve(self, video, index, path):
+        if video.resolve(index, path):
+            self._videos.put(video)
+
+    def _finish_task(self, task, path=None, error=None):
+        with self._tasks_lock:
+            self._tasks.pop(task.key, None)
+            waiters = task.waiters
+            task.done = True
+        for video, index in waiters:
+            if error is not None and video.error is None:
+                video.error = error
+            if path is not None and video.manifest:
+                video.manifest.finish(task.key, path)
+            self._resolve(video, index, path)
+
+    def _discard_writer(self, task):
+        if task.writer is not None:
+            try:
+                task.writer.close()
+            except Exception:
+                pass
+            task.writer = None
+        if task.temp_path and os.path.exists(task.temp_path):
+            os.remove(task.temp_path)
+
+    def _record_failure(self, index, error):
+        with self._results_lock:
+            self.failed.append(index)
+            self._report(f"job {index + 1} failed: {str(error)}")
+
+    def _report(self, message):
+        self._progress(f"[{len(self.done) + len(self.failed)}/{self._total}] {message}")
+
+    # Stage error handlers
+
+    def _fetch_failed(self, item, error):
+        self._record_failure(item[0], error)
+
+    def _composite_failed(self, task, error):
+        task.error = error
+        self._frames.put((task, None))
+
+    def _encode_failed(self, item, error):
+        task = item[0]
+        self._discard_writer(task)
+        if not task.done:
+            self._finish_task(task, error=error)
+
+    def _join_failed(self, video, error):
+        self._record_failure(video.index, error)
@@ -0,0 +1,222 @@
+import json
+import math
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds (ms) of the per-frame histogram buckets
+HISTOGRAM_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, float('inf'))
+
+# Allocations are traced for one in this many outermost profiled calls;
+# tracemalloc slows every allocation down, so those calls are left out of
+# the timings
+ALLOCATION_SAMPLE_EVERY = 10
+
+
+def percentile(ordered, p):
+    # Nearest-rank percentile (0 < p <= 1) of an ascending, non-empty list;
+    # shared with the render server's /metrics
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p * len(ordered)) - 1))]
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    count = len(ordered)
+    if not count:
+        return {'count': 0}
+
+    histogram = {}
+    bucket = 0
+    for bound in HISTOGRAM_BUCKETS_MS:
+        label = f"<={bound}ms" if bound != float('inf') else f">{HISTOGRAM_BUCKETS_MS[-2]}ms"
+        histogram[label] = 0
+    labels = list(histogram)
+    for sample in ordered:
+        while sample * 1000 > HISTOGRAM_BUCKETS_MS[bucket]:
+            bucket += 1
+        histogram[labels[bucket]] += 1
+
+    return {
+        'count': count,
+        'total_s': sum(ordered),
+        'mean_ms': sum(ordered) / count * 1000,
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'max_ms': ordered[-1] * 1000,
+        'histogram': histogram
+    }
+
+
+def _empty_allocations():
+    return {'calls': 0, 'blocks': 0, 'peak_bytes': 0, 'bytes': 0}
+
+
+class NullProfiler:
+    # Used when profiling is off: every hook is a no-op and frame functions
+    # are returned unwrapped
+    enabled = False
+    _context = nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+    def wrap_frame(self, name, func):
+        return func
+
+    def reset(self):
+        pass
+
+    def take_raw(self):
+        return None
+
+    def merge(self, raw):
+        pass
+
+    def write_report(self, path, **extra):
+        return None
+
+
+class RenderProfiler:
+    # Times render stages, keeps per-call samples for the per-frame hot
+    # paths (make_frame, compositing, encoder writes) and counts the
+    # allocations made inside them on a sample of the calls
+    enabled = True
+
+    def __init__(self, track_allocations=True, sample_every=ALLOCATION_SAMPLE_EVERY):
+        self.track_allocations = track_allocations
+        self.sample_every = sample_every
+        # Profiled calls can nest (make_frame -> blend); each thread keeps
+        # its stack of open calls
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self.frames = {}
+        self.allocations = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stage = self.stages.setdefault(name, {'calls': 0, 'total_s': 0.0})
+            stage['calls'] += 1
+            stage['total_s'] += elapsed
+
+    def wrap_frame(self, name, func):
+        samples = self.frames.setdefault(name, [])
+        allocations = self.allocations.setdefault(name, _empty_allocations())
+        outer_calls = [0]
+
+        def profiled(*args):
+            stack = self._stack()
+            if not stack:
+                # Whether allocations are traced is decided once for the
+                # outermost call and holds for every call nested in it
+                outer_calls[0] += 1
+                self._local.tracing = self._start_tracing(outer_calls[0])
+            if not self._local.tracing:
+                stack.append(None)
+                try:
+                    start = time.perf_counter()
+                    result = func(*args)
+                    samples.append(time.perf_counter() - start)
+                finally:
+                    stack.pop()
+                return result
+
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # reset_peak() below also clears the enclosing call's peak;
+                # it is kept on the stack and combined again on return
+                stack[-1][1] = max(stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            entry = [current, current]
+            stack.append(entry)
+            blocks = sys.getallocatedblocks()
+            try:
+                result = func(*args)
+            finally:
+                stack.pop()
+                _, peak = tracemalloc.get_traced_memory()
+                peak = max(entry[1], peak)
+                # Net Python blocks plus the transient peak (NumPy buffers
+                # are traced too) allocated during the call
+                allocations['calls'] += 1
+                allocations['blocks'] += max(sys.getallocatedblocks() - blocks, 0)
+                allocations['bytes'] += max(peak - entry[0], 0)
+                allocations['peak_bytes'] = max(allocations['peak_bytes'], peak - entry[0])
+                if stack:
+                    stack[-1][1] = max(stack[-1][1], peak)
+                elif self._local.tracing == 'started':
+                    tracemalloc.stop()
+            return result
+
+        return profiled
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _start_tracing(self, calls):
+        # 'started' when this call turned tracemalloc on and has to turn it
+        # off again, 'running' when someone else already traces
+        if not self.track_allocations or calls % self.sample_every:
+            return None
+        if tracemalloc.is_tracing():
+            return 'running'
+        tracemalloc.start()
+        return 'started'
+
+    def take_raw(self):
+        # Hand the collected data to another process and start over
+        raw = {'stages': self.stages, 'frames': self.frames, 'allocations': self.allocations}
+        self.reset()
+        return raw
+
+    def merge(self, raw):
+        if not raw:
+            return
+        for name, data in raw['stages'].items():
+            stage = self.stages.setdefault(name, {'calls': 0, 'total_s': 0.0})
+            stage['calls'] += data['calls']
+            stage['total_s'] += data['total_s']
+        for name, samples in raw['frames'].items():
+            self.frames.setdefault(name, []).extend(samples)
+        for name, data in raw['allocations'].items():
+            allocations = self.allocations.setdefault(name, _empty_allocations())
+            allocations['calls'] += data['calls']
+            allocations['blocks'] += data['blocks']
+            allocations['bytes'] += data['bytes']
+            allocations['peak_bytes'] = max(allocations['peak_bytes'], data['peak_bytes'])
+
+    def report(self):
+        frames = {}
+        for name, samples in self.frames.items():
+            frames[name] = _summary(samples)
+            allocations = self.allocations.get(name)
+            if self.track_allocations and allocations and allocations['calls']:
+                frames[name]['allocations'] = {
+                    'sampled_calls': allocations['calls'],
+                    'blocks_per_call': allocations['blocks'] / allocations['calls'],
+                    'bytes_per_call': allocations['bytes'] / allocations['calls'],
+                    'peak_bytes': allocations['peak_bytes']
+                }
+        return {'stages': self.stages, 'frames': frames}
+
+    def write_report(self, path, **extra):
+        report = dict(extra)
+        report.update(self.report())
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        return path
+
+
+NULL_PROFILER = NullProfiler()
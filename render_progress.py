@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import deque
+
+from proglog import ProgressBarLogger
+
+
+# Seconds of recent progress the reported render fps is measured over
+FPS_WINDOW = 5.0
+
+
+class RenderCancelled(Exception):
+    # Raised from a progress callback to stop a render between frames
+    pass
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class RenderProgress:
+    # Counts frames rendered and encoded across every segment of a video and
+    # reports percentage, render fps and ETA through a
+    # progress_callback(percentage, message), at most `rate` times a second.
+    # The fps covers the last FPS_WINDOW seconds of frames actually encoded;
+    # segments found in the cache count towards the percentage only.
+    def __init__(self, total_frames, callback=None, rate=4.0, start=0.0, end=95.0):
+        self.total_frames = max(int(total_frames), 1)
+        self.callback = callback
+        self.interval = 1.0 / rate if rate else 0.0
+        self.start = start
+        self.end = end
+        self.frames_rendered = 0
+        self.frames_encoded = 0
+        self.frames_cached = 0
+        self.started_at = time.monotonic()
+        # (time, frames encoded without cache hits), oldest first; the first
+        # entry is the last one from before the window
+        self._samples = deque([(self.started_at, 0)])
+        self._last_report = 0.0
+        self._segment_rendered = 0
+        self._segment_encoded = 0
+        self._segment_frames = 0
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    @property
+    def fps(self):
+        now = time.monotonic()
+        with self._lock:
+            since, base = self._samples[0]
+            count = self._samples[-1][1]
+        return (count - base) / (now - since) if now > since else 0.0
+
+    @property
+    def average_fps(self):
+        # Over the whole render so far, still without cache hits
+        elapsed = self.elapsed
+        return (self.frames_encoded - self.frames_cached) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        fps = self.fps
+        if not fps:
+            return None
+        return max(self.total_frames - self.frames_encoded, 0) / fps
+
+    @property
+    def percentage(self):
+        done = min(self.frames_encoded / self.total_frames, 1.0)
+        return self.start + (self.end - self.start) * done
+
+    def snapshot(self):
+        return {
+            'total_frames': self.total_frames,
+            'frames_rendered': self.frames_rendered,
+            'frames_encoded': self.frames_encoded,
+            'frames_cached': self.frames_cached,
+            'fps': self.fps,
+            'average_fps': self.average_fps,
+            'eta': self.eta,
+            'elapsed': self.elapsed
+        }
+
+    def message(self):
+        return (f"Rendering frame {self.frames_encoded}/{self.total_frames} "
+                f"({self.fps:.0f} fps, ETA {format_eta(self.eta)})")
+
+    def report(self, force=False):
+        if not self.callback:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        self.callback(self.percentage, self.message())
+
+    def begin_segment(self, frames):
+        # Encoder counts reported by ffmpeg/moviepy restart at zero for
+        # every segment; extra probe frames moviepy requests are not counted
+        with self._lock:
+            self._segment_rendered = self.frames_rendered
+            self._segment_encoded = self.frames_encoded
+            self._segment_frames = frames
+
+    def frame_rendered(self):
+        with self._lock:
+            self.frames_rendered = min(self.frames_rendered + 1,
+                                       self._segment_rendered + self._segment_frames)
+        self.report()
+
+    def set_segment_encoded(self, frames):
+        frames = min(frames, self._segment_frames)
+        with self._lock:
+            self.frames_encoded = max(self.frames_encoded, self._segment_encoded + frames)
+            self._sample()
+        self.report()
+
+    def frames_done(self, frames, rendered=False):
+        # Whole segments finished elsewhere: rendered by a worker, or found
+        # in the cache, which does not count towards the fps
+        with self._lock:
+            self.frames_rendered += frames
+            self.frames_encoded += frames
+            if not rendered:
+                self.frames_cached += frames
+            self._sample()
+        self.report()
+
+    def _sample(self):
+        now = time.monotonic()
+        samples = self._samples
+        samples.append((now, self.frames_encoded - self.frames_cached))
+        while len(samples) > 2 and samples[1][0] <= now - FPS_WINDOW:
+            samples.popleft()
+
+    def wrap(self, make_frame):
+        def counted(t):
+            frame = make_frame(t)
+            self.frame_rendered()
+            return frame
+        return counted
+
+
+class RenderProgressLogger(ProgressBarLogger):
+    # Forwards moviepy's per-frame writer bar to a RenderProgress
+    def __init__(self, progress):
+        super().__init__()
+        self.progress = progress
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        if bar == 't' and attr == 'index':
+            self.progress.set_segment_encoded(value + 1)
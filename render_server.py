@@ -0,0 +1,472 @@
+import argparse
+import functools
+import ipaddress
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import batch_render
+from app_paths import get_app_dir
+from encoder_profiles import DEFAULT_ENCODER, SELECTABLE_ENCODERS
+from render_jobs import CANCELLED, DONE, FAILED, QUEUED, RUNNING
+from render_profiler import percentile
+
+DEFAULT_PORT = 8765
+MAX_QUESTIONS = 50
+MAX_BODY_BYTES = 1024 * 1024
+# Host header names answered besides the address the server listens on
+LOCAL_HOST_NAMES = ('localhost', '127.0.0.1', '::1')
+
+
+def _init_worker(engine, offline, threads, segment_cache_mb, events):
+    # Ctrl+C reaches the whole process group; the server decides what
+    # happens to running jobs
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # The same warm generator and bank as a batch worker
+    batch_render._init_worker(engine, offline, threads=threads, segment_cache_mb=segment_cache_mb)
+    batch_render._worker['events'] = events
+
+
+def _warm():
+    # Only returns once the worker's initializer has run
+    return os.getpid()
+
+
+def _render(job_id, job, output_file):
+    worker = batch_render._worker
+    started_at = time.time()
+    worker['events'].put((job_id, os.getpid(), started_at))
+
+    generator = worker['generator']
+    facts = job.get('facts')
+    if facts is None:
+        facts = worker['bank'].job_questions(job, offline=worker['offline'])
+
+    if job['preview']:
+        # Shares the warm generator's caches
+        generator.preview().generate_video(facts, engine='pipe', output_file=output_file)
+    else:
+        # Passed every time: the generator keeps the last job's settings
+        generator.generate_video(facts, engine=worker['engine'], output_file=output_file,
+                                 encoder=job['encoder'], vfr=job['vfr'])
+    return {
+        'worker': os.getpid(),
+        'started_at': started_at,
+        'finished_at': time.time(),
+        'video_seconds': generator.video_duration(len(facts))
+    }
+
+
+def parse_job(data):
+    # Request body of POST /jobs: either {"facts": [{"question": ...,
+    # "correct_answer": ...}, ...]} or {"category": 9, "questions": 5,
+    # "difficulty": "easy"}, plus optional "encoder", "vfr" and "preview"
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    encoder = data.get('encoder', DEFAULT_ENCODER)
+    if encoder not in SELECTABLE_ENCODERS:
+        raise ValueError(f"Unknown encoder profile: {encoder}")
+    job = {'encoder': encoder, 'vfr': bool(data.get('vfr', False)), 'preview': bool(data.get('preview', False))}
+
+    facts = data.get('facts')
+    if facts is not None:
+        if (not isinstance(facts, list) or not facts or len(facts) > MAX_QUESTIONS
+                or not all(isinstance(fact, dict) and isinstance(fact.get('question'), str)
+                           and isinstance(fact.get('correct_answer'), str) for fact in facts)):
+            raise ValueError(f"facts must be a list of 1 to {MAX_QUESTIONS} objects with "
+                             "question and correct_answer strings")
+        job['facts'] = [{'question': fact['question'], 'correct_answer': fact['correct_answer']}
+                        for fact in facts]
+        return job
+
+    questions = data.get('questions', 5)
+    if not isinstance(questions, int) or isinstance(questions, bool) or not 1 <= questions <= MAX_QUESTIONS:
+        raise ValueError(f"questions must be a number from 1 to {MAX_QUESTIONS}")
+    category = data.get('category')
+    if category is not None and (not isinstance(category, int) or isinstance(category, bool)):
+        raise ValueError("category must be an OpenTDB category id")
+    difficulty = data.get('difficulty')
+    if difficulty not in (None, 'easy', 'medium', 'hard'):
+        raise ValueError("difficulty must be easy, medium or hard")
+    job.update(questions=questions, category=category, difficulty=difficulty)
+    return job
+
+
+def _summary(values):
+    if not values:
+        return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'max': None}
+    values = sorted(values)
+    return {'count': len(values), 'mean': sum(values) / len(values), 'p50': percentile(values, 0.5),
+            'p95': percentile(values, 0.95), 'max': values[-1]}
+
+
+class RenderServer:
+    # Renders submitted jobs in a pool of worker processes that are warmed up
+    # once (ffmpeg lookup, fonts, the think sprite, the countdown segment) and
+    # then kept for every later job, so no job pays the cold start
+    def __init__(self, output_dir, workers=1, engine='pipe', offline=False, segment_cache_mb=None):
+        self.output_dir = output_dir
+        self.workers = workers
+        self.engine = engine
+        self.offline = offline
+        self.segment_cache_mb = segment_cache_mb
+        # Each worker's encoder gets its share of the cores
+        self.threads = max(1, (os.cpu_count() or 1) // workers)
+        # Spawned, not forked: the parent runs the HTTP server's threads
+        self._context = multiprocessing.get_context('spawn')
+        self._events = self._context.Queue()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._pool = None
+        self._pending = deque()
+        self._in_flight = 0
+        self._stopping = False
+        self.jobs = {}
+        self.warm_seconds = 0.0
+        self.started_at = None
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._reader = threading.Thread(target=self._read_events, name="render-events", daemon=True)
+        self._reader.start()
+        self._start_pool()
+        threading.Thread(target=self._dispatch, name="render-dispatch", daemon=True).start()
+        self.started_at = time.time()
+
+    def _start_pool(self):
+        start = time.perf_counter()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context,
+                                         initializer=_init_worker,
+                                         initargs=(self.engine, self.offline, self.threads,
+                                                   self.segment_cache_mb, self._events))
+        # Submitted together, so every worker is started and warmed up now
+        # instead of on its first job
+        for future in [self._pool.submit(_warm) for _ in range(self.workers)]:
+            future.result()
+        self.warm_seconds = time.perf_counter() - start
+
+    def _read_events(self):
+        # Workers report when they pick a job up, which the pool itself does
+        # not tell
+        while True:
+            event = self._events.get()
+            if event is None:
+                break
+            job_id, worker, started_at = event
+            with self._lock:
+                record = self.jobs.get(job_id)
+                if record is not None and record['state'] == QUEUED:
+                    record.update(state=RUNNING, worker=worker, started_at=started_at)
+
+    def _dispatch(self):
+        # Hands queued jobs to the pool only as workers free up, so they wait
+        # here, where they can still be cancelled, rather than in the pool
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._stopping or (self._pending and self._in_flight < self.workers))
+                if self._stopping:
+                    return
+                record = self.jobs[self._pending.popleft()]
+                self._in_flight += 1
+            args = (record['id'], record['job'], record['output_file'])
+            try:
+                future = self._pool.submit(_render, *args)
+            except BrokenProcessPool:
+                # A worker died and took the pool with it
+                self._start_pool()
+                future = self._pool.submit(_render, *args)
+            future.add_done_callback(functools.partial(self._finished, record['id']))
+
+    def submit(self, job):
+        job_id = uuid.uuid4().hex[:12]
+        output_file = os.path.join(self.output_dir, f"trivia_{job_id}.mp4")
+        with self._changed:
+            self.jobs[job_id] = {'id': job_id, 'state': QUEUED, 'job': job, 'output_file': output_file,
+                                 'submitted_at': time.time(), 'started_at': None, 'finished_at': None,
+                                 'worker': None, 'video_seconds': None, 'error': None}
+            self._pending.append(job_id)
+            self._changed.notify_all()
+        return self.status(job_id)
+
+    def _finished(self, job_id, future):
+        with self._changed:
+            self._in_flight -= 1
+            self._changed.notify_all()
+            record = self.jobs.get(job_id)
+            if record is None:
+                return
+            if future.exception() is not None:
+                record.update(state=FAILED, finished_at=time.time(), error=str(future.exception()))
+            else:
+                record.update(state=DONE, **future.result())
+
+    def cancel(self, job_id):
+        # Queued jobs are cancelled and finished ones forgotten along with
+        # their video; returns False for a job a worker already has
+        with self._lock:
+            record = self.jobs.get(job_id)
+            if record is None:
+                raise KeyError(job_id)
+            if record['state'] in (QUEUED, RUNNING):
+                if job_id not in self._pending:
+                    return False
+                self._pending.remove(job_id)
+                record.update(state=CANCELLED, finished_at=time.time())
+                return True
+            del self.jobs[job_id]
+        if os.path.exists(record['output_file']):
+            os.remove(record['output_file'])
+        return True
+
+    def status(self, job_id):
+        with self._lock:
+            record = self.jobs.get(job_id)
+            if record is None:
+                raise KeyError(job_id)
+            return self._status(record, time.time())
+
+    def list_jobs(self):
+        now = time.time()
+        with self._lock:
+            return [self._status(record, now) for record in self.jobs.values()]
+
+    def video_path(self, job_id):
+        # None until the job is done
+        status = self.status(job_id)
+        return status['output_file'] if status['state'] == DONE else None
+
+    @staticmethod
+    def _status(record, now):
+        status = {key: value for key, value in record.items() if key != 'job'}
+        job = record['job']
+        status['encoder'] = 'draft' if job['preview'] else job['encoder']
+        status['questions'] = len(job['facts']) if 'facts' in job else job['questions']
+        started, finished = record['started_at'], record['finished_at']
+        status['queue_seconds'] = (started or finished or now) - record['submitted_at']
+        status['render_seconds'] = (finished or now) - started if started else None
+        status['latency_seconds'] = (finished or now) - record['submitted_at']
+        if record['state'] == DONE:
+            status['video_url'] = f"/jobs/{record['id']}/video"
+        return status
+
+    def metrics(self):
+        now = time.time()
+        uptime = now - self.started_at
+        with self._lock:
+            records = list(self.jobs.values())
+        states = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        busy = {}
+        for record in records:
+            states[record['state']] += 1
+            if record['started_at'] is not None and record['state'] in (RUNNING, DONE, FAILED):
+                # Jobs still rendering count up to now
+                busy_seconds = (record['finished_at'] or now) - record['started_at']
+                busy[record['worker']] = busy.get(record['worker'], 0.0) + busy_seconds
+        done = [record for record in records if record['state'] == DONE]
+        return {
+            'uptime_seconds': uptime,
+            'warm_up_seconds': self.warm_seconds,
+            'queue_depth': states[QUEUED],
+            'jobs': states,
+            'latency_seconds': {
+                'queue': _summary([r['started_at'] - r['submitted_at'] for r in done]),
+                'render': _summary([r['finished_at'] - r['started_at'] for r in done]),
+                'total': _summary([r['finished_at'] - r['submitted_at'] for r in done])
+            },
+            'video_seconds': sum(r['video_seconds'] for r in done),
+            'workers': {
+                'count': self.workers,
+                'busy': states[RUNNING],
+                'utilization': sum(busy.values()) / (uptime * self.workers) if uptime else 0.0,
+                'busy_seconds': {str(pid): seconds for pid, seconds in busy.items()}
+            }
+        }
+
+    def shutdown(self):
+        with self._changed:
+            self._stopping = True
+            for job_id in self._pending:
+                self.jobs[job_id].update(state=CANCELLED, finished_at=time.time())
+            self._pending.clear()
+            self._changed.notify_all()
+        if self._pool is not None:
+            # Running jobs are stopped as well: nobody is left to fetch them
+            for process in multiprocessing.active_children():
+                process.terminate()
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self._events.put(None)
+        self._reader.join()
+
+
+def is_loopback(host):
+    # Only for the address to listen on; Host headers are never resolved
+    try:
+        return all(ipaddress.ip_address(info[4][0].split('%')[0]).is_loopback
+                   for info in socket.getaddrinfo(host, None))
+    except (OSError, ValueError):
+        return False
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    server_version = "TriviaRenderServer/1.0"
+
+    def do_GET(self):
+        if not self._allowed():
+            return
+        path = urlsplit(self.path).path.rstrip('/')
+        render = self.server.render
+        if path == '/metrics':
+            return self._send_json(HTTPStatus.OK, render.metrics())
+        if path == '/jobs':
+            return self._send_json(HTTPStatus.OK, {'jobs': render.list_jobs()})
+
+        match = re.fullmatch(r'/jobs/([0-9a-f]+)(/video)?', path)
+        if not match:
+            return self._send_error(HTTPStatus.NOT_FOUND, "Not found")
+        job_id, video = match.groups()
+        try:
+            if not video:
+                return self._send_json(HTTPStatus.OK, render.status(job_id))
+            video_path = render.video_path(job_id)
+        except KeyError:
+            return self._send_error(HTTPStatus.NOT_FOUND, f"Unknown job: {job_id}")
+        if video_path is None:
+            return self._send_error(HTTPStatus.CONFLICT, "The video is not ready")
+        self._send_file(video_path, f"trivia_{job_id}.mp4")
+
+    def do_POST(self):
+        if not self._allowed():
+            return
+        if urlsplit(self.path).path.rstrip('/') != '/jobs':
+            return self._send_error(HTTPStatus.NOT_FOUND, "Not found")
+        # Only plain digits: a negative length would make rfile.read() wait
+        # for the client to close
+        length = (self.headers.get('Content-Length') or '0').strip()
+        if not re.fullmatch(r'[0-9]+', length):
+            return self._send_error(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            return self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        try:
+            job = parse_job(json.loads(self.rfile.read(length) or b'{}'))
+        except ValueError as e:
+            return self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+        status = self.server.render.submit(job)
+        self._send_json(HTTPStatus.ACCEPTED, status, {'Location': f"/jobs/{status['id']}"})
+
+    def do_DELETE(self):
+        if not self._allowed():
+            return
+        match = re.fullmatch(r'/jobs/([0-9a-f]+)', urlsplit(self.path).path.rstrip('/'))
+        if not match:
+            return self._send_error(HTTPStatus.NOT_FOUND, "Not found")
+        try:
+            removed = self.server.render.cancel(match.group(1))
+        except KeyError:
+            return self._send_error(HTTPStatus.NOT_FOUND, f"Unknown job: {match.group(1)}")
+        if not removed:
+            return self._send_error(HTTPStatus.CONFLICT, "The job is already rendering")
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self.end_headers()
+
+    def _allowed(self):
+        # Loopback clients only, and only requests addressed to a fixed list
+        # of local names: a page on a name that was rebound to 127.0.0.1
+        # still sends its own name as Host
+        try:
+            host = urlsplit(f"//{self.headers.get('Host', '')}").hostname
+        except ValueError:
+            host = None
+        if ipaddress.ip_address(self.client_address[0]).is_loopback and host in self.server.allowed_hosts:
+            return True
+        self._send_error(HTTPStatus.FORBIDDEN, "Only local requests are accepted")
+        return False
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_json(status, {'error': message})
+
+    def _send_file(self, path, filename):
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return self._send_error(HTTPStatus.GONE, "The video was removed")
+        with f:
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', 'video/mp4')
+            self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+            self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+
+class LocalHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, render):
+        # IPv6 loopback needs an IPv6 socket
+        self.address_family = socket.getaddrinfo(address[0], address[1])[0][0]
+        self.render = render
+        self.allowed_hosts = set(LOCAL_HOST_NAMES) | {address[0].lower()}
+        super().__init__(address, RenderRequestHandler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local HTTP API that renders trivia videos "
+                                                 "on warm worker processes")
+    parser.add_argument('--host', default='127.0.0.1', help="Loopback address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes (default: 1)")
+    parser.add_argument('--engine', choices=('moviepy', 'pipe'), default='pipe')
+    parser.add_argument('--output-dir', default=os.path.join(get_app_dir(), "server_output"))
+    parser.add_argument('--offline', action='store_true', help="Only use questions already in the local bank")
+    parser.add_argument('--segment-cache-mb', type=float,
+                        help="Disk budget for encoded segments reused between videos (default: 2048)")
+    args = parser.parse_args(argv)
+    if not is_loopback(args.host):
+        parser.error("--host must be a loopback address; the server is for local use only")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    render = RenderServer(args.output_dir, args.workers, args.engine, args.offline, args.segment_cache_mb)
+    print(f"Warming up {args.workers} worker{'s' if args.workers != 1 else ''}...")
+    render.start()
+    httpd = LocalHTTPServer((args.host, args.port), render)
+    print(f"Workers ready in {render.warm_seconds:.1f}s")
+    host = f"[{args.host}]" if ':' in args.host else args.host
+    print(f"Listening on http://{host}:{httpd.server_address[1]} (Ctrl+C to stop)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        render.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
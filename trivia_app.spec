@@ -7,7 +7,7 @@ excluded_modules = [
     'pandas', 'scipy', 'PyQt5', 'PySide2', 'wx', 'test', 'distutils',
     'IPython', 'PIL.ImageQt', 'PyQt4', 'sphinx', 'twisted', 'zope', 'h5py',
     'zmq', 'babel', 'curses', 'cvxopt', 'tornado', 'tcl', 'tk', 'docutils',
-    'setuptools', 'distribute', 'pip', 'pycparser', 'sqlite3', 'email',
+    'setuptools', 'distribute', 'pip', 'pycparser', 'email',
     '_ssl', 'unittest', 'pdb', 'difflib', 'pyreadline'
 ]
 
@@ -32,12 +32,12 @@ def exclude_from_binaries(binaries, patterns):
     return [b for b in binaries if not any(pattern in b[0].lower() for pattern in patterns)]
 
 excluded_binary_patterns = [
-    'tcl8', 'tk8', '_tkinter', 'sqlite3', 'libopenblas',
+    'tcl8', 'tk8', '_tkinter', 'libopenblas',
     'mkl', 'libiomp5md', 'pywintypes', 'pythoncom',
     'qt5', 'qt6', 'webkit', 'webengine', 'designer',
     'qwindows', 'platforms/', 'imageformats/', 'audio/',
-    'libcrypto', 'libssl', 'libffi', '_decimal', '_queue',
-    '_asyncio', '_overlapped', '_ctypes', '_multiprocessing'
+    'libcrypto', 'libssl', 'libffi', '_decimal',
+    '_asyncio', '_overlapped', '_ctypes'
 ]
 
 a.binaries = exclude_from_binaries(a.binaries, excluded_binary_patterns)
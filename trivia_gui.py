@@ -1,22 +1,30 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import requests
-from trivia_shorts_generator import TriviaVideoGenerator
-import threading
+from app_paths import get_app_dir
+from encoder_profiles import DEFAULT_ENCODER, SELECTABLE_ENCODERS
+from render_jobs import RenderJobQueue, QUEUED, RUNNING, DONE, FAILED, CANCELLED
+import multiprocessing
 import webbrowser
-from PIL import Image, ImageTk
 import io
-import urllib.request
 import os
+import queue
 import sys
+import subprocess
+import threading
+
+# The window has to appear before anything slow runs: the question bank,
+# PIL and the renderer (moviepy, numpy) are imported on first use, and the
+# network is only touched from background threads
+
+PROFILE_IMAGE_URL = "https://raw.githubusercontent.com/iTMaster228/iTMaster228/main/dp.png"
 
 class TriviaGUI:
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("Trivia Video Generator")
-        self.root.geometry("400x400")
-        self.root.minsize(400, 400)
-        self.root.maxsize(400, 400)
+        self.root.geometry("400x460")
+        self.root.minsize(400, 460)
+        self.root.maxsize(400, 460)
         
         # Modern color scheme
         self.colors = {
@@ -32,10 +40,29 @@ class TriviaGUI:
         
         self.root.configure(bg=self.colors['bg'])
         
+        # Opened by the category loader thread
+        self.question_bank = None
+        
+        # Callables that background threads hand to the Tk loop
+        self._ui_calls = queue.Queue()
+        
+        # Renders run in worker processes; the Tk loop polls them for
+        # progress, so widgets are only ever touched from this thread
+        self.jobs = RenderJobQueue(workers=1)
+        self.poll_interval_ms = 100
+        
+        # Questions drawn for the last preview, reused by the next full
+        # render with the same category and count
+        self._preview_facts = None
+        
         # Style configuration
         self.setup_styles()
         self.setup_ui()
-        self.load_categories()
+        self._run_in_background(self.load_categories)
+        self._run_in_background(self.load_profile_image)
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.root.after(self.poll_interval_ms, self._poll_jobs)
 
     def setup_styles(self):
         style = ttk.Style()
@@ -134,6 +161,24 @@ class TriviaGUI:
         style.map('Custom.TCombobox',
                  fieldbackground=[('readonly', self.colors['secondary_bg'])],
                  selectbackground=[('readonly', self.colors['secondary_bg'])])
+        
+        # Configure job list style
+        style.configure('Custom.Treeview',
+                       background=self.colors['secondary_bg'],
+                       fieldbackground=self.colors['secondary_bg'],
+                       foreground=self.colors['text'],
+                       font=('Segoe UI', 9),
+                       borderwidth=0)
+        
+        style.configure('Custom.Treeview.Heading',
+                       background=self.colors['bg'],
+                       foreground=self.colors['text_secondary'],
+                       font=('Segoe UI', 9, 'bold'),
+                       borderwidth=0)
+        
+        style.map('Custom.Treeview',
+                 background=[('selected', self.colors['accent'])],
+                 foreground=[('selected', self.colors['text'])])
 
     def setup_ui(self):
         # Create notebook for tabs
@@ -144,11 +189,16 @@ class TriviaGUI:
         self.home_frame = ttk.Frame(self.notebook, style='Custom.TFrame')
         self.notebook.add(self.home_frame, text='Home')
         
+        # Create Queue tab
+        self.queue_frame = ttk.Frame(self.notebook, style='Custom.TFrame')
+        self.notebook.add(self.queue_frame, text='Queue')
+        
         # Create About tab
         self.about_frame = ttk.Frame(self.notebook, style='Custom.TFrame')
         self.notebook.add(self.about_frame, text='About')
         
         self.setup_home_tab()
+        self.setup_queue_tab()
         self.setup_about_tab()
 
     def setup_home_tab(self):
@@ -207,14 +257,44 @@ class TriviaGUI:
         )
         questions_entry.pack(fill='x', ipady=5)
         
-        # Generate button
-        self.generate_button = ttk.Button(
+        # Encoder profile
+        encoder_label = ttk.Label(
             container,
+            text="Encoder Profile",
+            style='Header.TLabel'
+        )
+        encoder_label.pack(anchor='w')
+        
+        self.encoder_var = tk.StringVar(value=DEFAULT_ENCODER)
+        self.encoder_combo = ttk.Combobox(
+            container,
+            textvariable=self.encoder_var,
+            values=SELECTABLE_ENCODERS,
+            style='Custom.TCombobox',
+            state='readonly',
+            height=len(SELECTABLE_ENCODERS)
+        )
+        self.encoder_combo.pack(fill='x', pady=(2, 10))
+        
+        # Preview and Generate buttons
+        button_frame = ttk.Frame(container, style='Custom.TFrame')
+        button_frame.pack(pady=15)
+        
+        self.preview_button = ttk.Button(
+            button_frame,
+            text="Preview",
+            style='Custom.TButton',
+            command=self.preview_video
+        )
+        self.preview_button.pack(side='left', padx=5)
+        
+        self.generate_button = ttk.Button(
+            button_frame,
             text="Generate Video",
             style='Custom.TButton',
             command=self.generate_video
         )
-        self.generate_button.pack(pady=15)
+        self.generate_button.pack(side='left', padx=5)
         
         # Progress bar
         self.progress_var = tk.DoubleVar()
@@ -238,31 +318,85 @@ class TriviaGUI:
         # Status label
         self.status_label = ttk.Label(
             container,
-            text="Ready to generate video",
+            text="Loading categories...",
             style='Status.TLabel',
             justify='center'
         )
         self.status_label.pack(fill='x')
 
+    def setup_queue_tab(self):
+        container = ttk.Frame(self.queue_frame, style='Custom.TFrame')
+        container.pack(expand=True, fill='both', padx=20, pady=15)
+        
+        title_label = ttk.Label(
+            container,
+            text="Render Queue",
+            style='Title.TLabel'
+        )
+        title_label.pack(pady=(0, 10))
+        
+        # One row per job, oldest first
+        columns = ('job', 'questions', 'encoder', 'status')
+        self.job_tree = ttk.Treeview(
+            container,
+            columns=columns,
+            show='headings',
+            style='Custom.Treeview',
+            selectmode='browse',
+            height=10
+        )
+        for column, heading, width in zip(columns, ("Job", "Questions", "Encoder", "Status"),
+                                          (50, 75, 75, 150)):
+            self.job_tree.heading(column, text=heading)
+            self.job_tree.column(column, width=width, anchor='center')
+        self.job_tree.pack(fill='both', expand=True, pady=(0, 10))
+        
+        controls = ttk.Frame(container, style='Custom.TFrame')
+        controls.pack(fill='x')
+        
+        workers_label = ttk.Label(
+            controls,
+            text="Workers",
+            style='Header.TLabel'
+        )
+        workers_label.pack(side='left')
+        
+        self.workers_var = tk.StringVar(value=str(self.jobs.workers))
+        workers_spin = tk.Spinbox(
+            controls,
+            from_=1,
+            to=max(1, os.cpu_count() or 1),
+            textvariable=self.workers_var,
+            width=4,
+            font=('Segoe UI', 9),
+            bg=self.colors['secondary_bg'],
+            fg=self.colors['text'],
+            buttonbackground=self.colors['secondary_bg'],
+            insertbackground=self.colors['text'],
+            relief='flat',
+            justify='center'
+        )
+        workers_spin.pack(side='left', padx=5)
+        # Arrows and typed values both go through the variable
+        self.workers_var.trace_add('write', self.set_workers)
+        workers_spin.bind('<FocusOut>', lambda event: self.workers_var.set(str(self.jobs.workers)))
+        
+        self.cancel_button = ttk.Button(
+            controls,
+            text="Cancel Selected",
+            style='Custom.TButton',
+            command=self.cancel_selected
+        )
+        self.cancel_button.pack(side='right')
+
     def setup_about_tab(self):
         # Main container with padding
         container = ttk.Frame(self.about_frame, style='Custom.TFrame')
         container.pack(expand=True, fill='both', padx=20, pady=15)
         
-        try:
-            # Load and display profile image (smaller size)
-            image_url = "https://raw.githubusercontent.com/iTMaster228/iTMaster228/main/dp.png"
-            with urllib.request.urlopen(image_url) as url:
-                raw_data = url.read()
-            image = Image.open(io.BytesIO(raw_data))
-            image = image.resize((80, 80), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(image)
-            
-            image_label = ttk.Label(container, image=photo, style='Custom.TLabel')
-            image_label.image = photo
-            image_label.pack(pady=5)
-        except Exception as e:
-            print(f"Error loading profile image: {e}")
+        # Profile image, filled in by load_profile_image
+        self.image_label = ttk.Label(container, style='Custom.TLabel')
+        self.image_label.pack(pady=5)
 
         # Name and title
         name_label = ttk.Label(
@@ -307,17 +441,56 @@ class TriviaGUI:
             )
             btn.grid(row=i//3, column=i%3, padx=3, pady=3, sticky='ew')
 
+    def _run_in_background(self, target):
+        threading.Thread(target=target, daemon=True).start()
+
+    def _call_in_ui(self, func, *args):
+        # Safe from any thread; runs on the next poll of the Tk loop
+        self._ui_calls.put((func, args))
+
     def load_categories(self):
+        # Background thread: the bank serves the stored list and only goes
+        # to the network once it is older than its TTL
+        try:
+            from question_bank import QuestionBank
+            self.question_bank = QuestionBank()
+            categories = self.question_bank.categories()
+        except Exception as e:
+            self._call_in_ui(self._categories_failed, str(e))
+            return
+        self._call_in_ui(self._show_categories, categories)
+
+    def _show_categories(self, categories):
+        if not categories:
+            self.status_label.config(text="No categories available")
+            return
+        self.categories = {cat['name']: cat['id'] for cat in categories}
+        self.category_combo['values'] = list(self.categories.keys())
+        self.category_combo.set(list(self.categories.keys())[0])
+        self.status_label.config(text="Categories loaded successfully")
+
+    def _categories_failed(self, error):
+        self.status_label.config(text="Failed to load categories")
+        messagebox.showerror("Error", f"Failed to load categories: {error}")
+
+    def load_profile_image(self):
+        # Background thread: download (cached on disk) and scale; only the
+        # Tk image itself is created on the Tk thread
         try:
-            response = requests.get('https://opentdb.com/api_category.php')
-            categories = response.json()['trivia_categories']
-            self.categories = {cat['name']: cat['id'] for cat in categories}
-            self.category_combo['values'] = list(self.categories.keys())
-            self.category_combo.set(list(self.categories.keys())[0])
-            self.status_label.config(text="Categories loaded successfully")
+            from PIL import Image
+            from web_cache import fetch_cached
+            image = Image.open(io.BytesIO(fetch_cached(PROFILE_IMAGE_URL)))
+            image = image.resize((80, 80), Image.Resampling.LANCZOS)
         except Exception as e:
-            self.status_label.config(text="Failed to load categories")
-            messagebox.showerror("Error", f"Failed to load categories: {str(e)}")
+            print(f"Error loading profile image: {e}")
+            return
+        self._call_in_ui(self._show_profile_image, image)
+
+    def _show_profile_image(self, image):
+        from PIL import ImageTk
+        photo = ImageTk.PhotoImage(image)
+        self.image_label.config(image=photo)
+        self.image_label.image = photo
 
     def update_status(self, message, is_error=False):
         self.status_label.config(
@@ -325,16 +498,26 @@ class TriviaGUI:
             foreground=self.colors['error'] if is_error else self.colors['text']
         )
 
-    def update_progress(self, percentage, message):
-        def update():
-            self.progress_var.set(percentage)
-            self.progress_label.config(text=f"{int(percentage)}%")
-            if message:
-                self.progress_label.config(text=message)
+    def set_workers(self, *args):
+        try:
+            workers = int(self.workers_var.get())
+        except ValueError:
+            # Mid-edit, e.g. an empty field; restored when focus leaves
+            return
+        self.jobs.workers = max(1, workers)
 
-        self.root.after(0, update)
+    def cancel_selected(self):
+        for item in self.job_tree.selection():
+            self.jobs.cancel(int(item))
+        self._refresh_jobs()
 
     def generate_video(self):
+        self._submit_job(preview=False)
+
+    def preview_video(self):
+        self._submit_job(preview=True)
+
+    def _submit_job(self, preview):
         if not hasattr(self, 'categories'):
             self.update_status("Categories not loaded", True)
             return
@@ -346,61 +529,113 @@ class TriviaGUI:
         except ValueError as e:
             self.update_status(str(e), True)
             return
-            
-        self.generate_button.state(['disabled'])
-        self.update_status("Generating video...")
-        self.progress_label.config(text="Fetching questions...")
         
-        thread = threading.Thread(target=self._generate_video_thread)
-        thread.daemon = True
-        thread.start()
+        category_id = self.categories[self.category_combo.get()]
+        job = {'category': category_id, 'questions': num_questions, 'encoder': self.encoder_var.get(),
+               'preview': preview}
+        if self._preview_facts and self._preview_facts[:2] == (category_id, num_questions):
+            # Render the questions that were just previewed
+            job['facts'] = self._preview_facts[2]
+            if not preview:
+                self._preview_facts = None
+        
+        job_id = self.jobs.submit(job)
+        self.update_status(f"{'Preview' if preview else 'Video'} queued as job {job_id}")
+        self._refresh_jobs()
 
-    def _generate_video_thread(self):
+    def _poll_jobs(self):
+        # One failing update must not stop the loop, or the GUI silently
+        # stops reporting jobs
         try:
-            selected_category = self.category_combo.get()
-            category_id = self.categories[selected_category]
-            num_questions = int(self.questions_var.get())
-            
-            url = f'https://opentdb.com/api.php?amount={num_questions}&category={category_id}&type=multiple'
-            response = requests.get(url)
-            data = response.json()
-            
-            if data['response_code'] != 0:
-                raise Exception("Failed to fetch questions")
-                
-            generator = TriviaVideoGenerator()
-            try:
-                output_file = generator.generate_video(data['results'], self.update_progress)
-                self.update_status("Video generated successfully!", False)
-                
-                # Get relative path for display
-                if getattr(sys, 'frozen', False):
-                    base_dir = os.path.dirname(sys.executable)
-                else:
-                    base_dir = os.path.dirname(os.path.abspath(__file__))
-                    
-                rel_path = os.path.relpath(output_file, base_dir)
-                messagebox.showinfo("Success", f"Video has been generated!\nSaved as: {rel_path}")
-                
-            except PermissionError as e:
-                error_msg = "Permission denied. Please run the application as administrator."
-                self.update_status(error_msg, True)
-                messagebox.showerror("Error", error_msg)
-            except Exception as e:
-                error_msg = f"Failed to generate video: {str(e)}"
-                self.update_status(error_msg, True)
-                messagebox.showerror("Error", error_msg)
-            
-        except Exception as e:
-            self.progress_label.config(text="")
-            error_msg = f"Error: {str(e)}"
+            while True:
+                try:
+                    func, args = self._ui_calls.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    func(*args)
+                except Exception as e:
+                    print(f"Error in UI update: {e}")
+
+            for job_id, kind, value in self.jobs.poll():
+                try:
+                    self._job_event(job_id, kind, value)
+                except Exception as e:
+                    print(f"Error handling job {job_id} event: {e}")
+
+            self._refresh_jobs()
+        finally:
+            self.root.after(self.poll_interval_ms, self._poll_jobs)
+
+    def _job_event(self, job_id, kind, value):
+        job = self.jobs.jobs[job_id]['job']
+        if kind == 'facts':
+            if job['preview']:
+                self._preview_facts = (job['category'], job['questions'], value)
+            # Refill the bank for this category in the background
+            if self.question_bank is not None:
+                self.question_bank.start_prefetch([job['category']])
+        elif kind == DONE:
+            self._job_done(job_id, job, value)
+        elif kind == FAILED:
+            error_msg = f"Job {job_id} failed: {value}"
             self.update_status(error_msg, True)
             messagebox.showerror("Error", error_msg)
+        elif kind == CANCELLED:
+            self.update_status(f"Job {job_id} cancelled")
+
+    def _job_done(self, job_id, job, output_file):
+        if job['preview']:
+            self.update_status("Preview ready - Generate Video renders these questions", False)
+            self._open_file(output_file)
+            return
         
-        finally:
-            self.generate_button.state(['!disabled'])
+        self.update_status(f"Job {job_id}: video generated successfully!", False)
+        
+        # Get relative path for display
+        rel_path = os.path.relpath(output_file, get_app_dir())
+        messagebox.showinfo("Success", f"Video has been generated!\nSaved as: {rel_path}")
+
+    def _refresh_jobs(self):
+        current = None
+        for job_id, info in self.jobs.jobs.items():
+            job = info['job']
+            if info['state'] in (QUEUED, RUNNING):
+                status = info['message'] or f"{int(info['progress'])}%"
+            else:
+                status = info['state'].capitalize()
+            values = (job_id, job['questions'], "preview" if job['preview'] else job['encoder'], status)
+            item = str(job_id)
+            if self.job_tree.exists(item):
+                self.job_tree.item(item, values=values)
+            else:
+                self.job_tree.insert('', 'end', iid=item, values=values)
+            if info['state'] == RUNNING and current is None:
+                current = info
+        
+        # The Home tab follows the oldest running job
+        if current is None:
             self.progress_var.set(0)
             self.progress_label.config(text="")
+        else:
+            self.progress_var.set(current['progress'])
+            self.progress_label.config(text=current['message'] or f"{int(current['progress'])}%")
+
+    def _open_file(self, path):
+        try:
+            if sys.platform == 'win32':
+                os.startfile(path)
+            elif sys.platform == 'darwin':
+                subprocess.Popen(['open', path])
+            else:
+                subprocess.Popen(['xdg-open', path])
+        except OSError as e:
+            # No viewer installed (e.g. no xdg-open)
+            self.update_status(f"Saved {path} but could not open it: {e}", True)
+
+    def close(self):
+        self.jobs.shutdown()
+        self.root.destroy()
 
     def run(self):
         # Center the window on the screen
@@ -414,5 +649,6 @@ class TriviaGUI:
         self.root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = TriviaGUI()
     app.run()
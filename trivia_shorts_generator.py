@@ -1,141 +1,570 @@
-import requests
-from moviepy.editor import *
-import pygame
 import html
 import os
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageSequence
 import numpy as np
-from textwrap import wrap
 import math
-import sys
 import datetime
+import copy
+import functools
+import itertools
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from app_paths import get_app_dir, get_asset_dir
+from encoder_profiles import DEFAULT_ENCODER, ENCODER_PROFILES, encoder_params
+from question_bank import QuestionBank
+from render_progress import RenderCancelled, RenderProgress, RenderProgressLogger
+from render_profiler import NULL_PROFILER, RenderProfiler
+from render_cache import SegmentCache, content_key, default_slide_cache
+from render_manifest import JOINING, RenderManifest, clear_partial_segments, manifest_path, pinned_segments
+from font_registry import default_font_registry
+from animation_engine import Bar, Disc, FieldLayer, MaskLayer, Ring, Scene, ellipse_mask, wave
+
+
+def _ffmpeg_binary():
+    # moviepy (and the ffmpeg lookup behind it) is only imported once
+    # something is actually encoded
+    from moviepy.config import get_setting
+    return get_setting("FFMPEG_BINARY")
+
+
+def _popen_flags():
+    # Keep ffmpeg from flashing a console window on Windows
+    return 0x08000000 if os.name == 'nt' else 0
+
+
+def concat_segments(segment_files, output_file, faststart=True, durations=None):
+    # Join segments that share codec parameters with ffmpeg's concat demuxer,
+    # copying the encoded streams instead of re-encoding them. Known segment
+    # durations are written to the list so variable-frame-rate segments,
+    # whose last frame is held, are placed exactly.
+    fd, list_file = tempfile.mkstemp(suffix=".txt", prefix="trivia_concat_")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for i, path in enumerate(segment_files):
+                path = os.path.abspath(path).replace('\\', '/').replace("'", "'\\''")
+                f.write(f"file '{path}'\n")
+                if durations:
+                    f.write(f"duration {durations[i]}\n")
+
+        cmd = [
+            _ffmpeg_binary(), '-y', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', list_file,
+            '-c', 'copy'
+        ]
+        if faststart:
+            # Move the index to the front so playback starts before download ends
+            cmd += ['-movflags', '+faststart']
+        cmd.append(output_file)
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                creationflags=_popen_flags())
+        if result.returncode != 0:
+            raise IOError(f"ffmpeg concat failed: {result.stderr.decode(errors='replace').strip()}")
+    finally:
+        os.remove(list_file)
+
+
+# 'moviepy' renders through moviepy clips, 'pipe' writes raw frames to ffmpeg
+RENDER_ENGINES = ('moviepy', 'pipe')
+
+# Output sizes for generate_renditions()
+RENDITIONS = {
+    'short': (1080, 1920),
+    'landscape': (1920, 1080),
+    'square': (1080, 1080),
+}
+
+# Static segments in VFR mode keep this many frames at the normal rate at
+# each end and hold the frame in between. x264 derives decode timestamps
+# from the frames around each one (B-frame delay), so without them the
+# segment's decode timeline, and the duration the MP4 muxer writes, would
+# not match the other segments.
+STATIC_EDGE_FRAMES = 3
+
+# Draft renders: a quarter of the resolution at 10 fps with the fastest x264
+# preset, laid out exactly like the final video
+PREVIEW_SCALE = 0.25
+PREVIEW_FPS = 10
+
+# Part of every slide and segment cache key. Bump it whenever a change to
+# the drawing code or its constants alters rendered pixels, so the
+# persistent caches stop serving what the old code drew.
+RENDER_VERSION = 1
+
+
+class StaticFrame:
+    # make_frame for a span that shows the same frame for its whole duration
+    def __init__(self, frame):
+        self.frame = frame
+
+    def __call__(self, t):
+        return self.frame
+
+
+def spans_to_clip(spans):
+    from moviepy.video.VideoClip import VideoClip
+    from moviepy.video.compositing.concatenate import concatenate_videoclips
+    clips = [VideoClip(make_frame, duration=duration) for make_frame, duration in spans]
+    return clips[0] if len(clips) == 1 else concatenate_videoclips(clips)
+
+
+class FFmpegPipeWriter:
+    # Streams contiguous uint8 RGB frames straight into ffmpeg's stdin, with
+    # the same output settings moviepy's writer uses
+    def __init__(self, path, size, fps, codec='libx264', on_encoded=None, preset='medium',
+                 threads=None, params=()):
+        self.path = path
+        self.frame_bytes = size[0] * size[1] * 3
+        cmd = [
+            _ffmpeg_binary(), '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-vcodec', 'rawvideo',
+            '-s', f'{size[0]}x{size[1]}', '-pix_fmt', 'rgb24',
+            '-r', f'{fps:.02f}', '-i', '-',
+            '-an', '-vcodec', codec, '-preset', preset,
+            '-pix_fmt', 'yuv420p'
+        ]
+        cmd += list(params)
+        if threads:
+            cmd += ['-threads', str(threads)]
+        if on_encoded:
+            # ffmpeg reports the number of encoded frames on stdout
+            cmd += ['-progress', 'pipe:1', '-nostats']
+        cmd.append(path)
+
+        self.log = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE if on_encoded else subprocess.DEVNULL,
+                                     stderr=self.log, creationflags=_popen_flags())
+        self.reader = None
+        if on_encoded:
+            self.reader = threading.Thread(target=self._read_progress,
+                                           args=(self.proc.stdout, on_encoded), daemon=True)
+            self.reader.start()
+
+    @staticmethod
+    def _read_progress(stdout, on_encoded):
+        for line in stdout:
+            if line.startswith(b'frame='):
+                try:
+                    on_encoded(int(line[6:]))
+                except ValueError:
+                    pass
+
+    def write_frame(self, frame):
+        if frame.dtype != np.uint8 or not frame.flags['C_CONTIGUOUS']:
+            frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        if frame.nbytes != self.frame_bytes:
+            raise ValueError(f"Frame has {frame.nbytes} bytes, expected {self.frame_bytes}")
+        try:
+            self.proc.stdin.write(memoryview(frame).cast('B'))
+        except BrokenPipeError:
+            self.close()
+            raise
+
+    def close(self):
+        if self.proc is None:
+            return
+        proc, self.proc = self.proc, None
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = proc.wait()
+        if self.reader:
+            self.reader.join()
+            proc.stdout.close()
+        self.log.seek(0)
+        error = self.log.read().decode(errors='replace').strip()
+        self.log.close()
+        if returncode != 0:
+            raise IOError(f"ffmpeg failed writing {self.path}: {error}")
+
+
+class SpriteAnimation:
+    # A single-colour animation kept as compact uint8 stacks: a shade stack
+    # mapped to the tint colour through a lookup table, plus an alpha mask
+    def __init__(self, shade, alpha, color, frame_starts, duration):
+        self.shade = shade
+        self.alpha = alpha
+        self.color = color
+        self.frame_starts = frame_starts
+        self.duration = duration
+        self.h, self.w = shade.shape[1:3]
+        self.lut = (np.arange(256, dtype=np.uint16)[:, None]
+                    * np.array(color, dtype=np.uint16) // 255).astype(np.uint8)
+
+    def index_at(self, t):
+        return int(np.searchsorted(self.frame_starts, t % self.duration, side='right')) - 1
+
+    def rgb_at(self, t):
+        return np.take(self.lut, self.shade[self.index_at(t)], axis=0)
+
+    def alpha_at(self, t):
+        return self.alpha[self.index_at(t)]
+
+    def to_clip(self, duration):
+        from moviepy.video.VideoClip import VideoClip
+        clip = VideoClip(self.rgb_at, duration=duration)
+        mask = VideoClip(lambda t: self.alpha_at(t) / 255.0, ismask=True, duration=duration)
+        return clip.set_mask(mask)
+
+
+class RegionCompositor:
+    # Keeps the static background as one uint8 frame and only redraws the
+    # bounding box of the animated sprite, blending in integer arithmetic
+    def __init__(self, background, sprite, x, y):
+        self.frame = np.array(background, dtype=np.uint8, copy=True)
+        self.sprite = sprite
+        height, width = self.frame.shape[:2]
+
+        # Clip the sprite's bounding box to the frame
+        x, y = int(x), int(y)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sprite.w, width), min(y + sprite.h, height)
+        self.region = (slice(y0, y1), slice(x0, x1))
+        self.sprite_region = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+
+        shape = (max(y1 - y0, 0), max(x1 - x0, 0))
+        self.lut = sprite.lut.astype(np.uint16)
+        self.background = self.frame[self.region].astype(np.uint16)
+        self.fg = np.empty(shape + (3,), dtype=np.uint16)
+        self.acc = np.empty(shape + (3,), dtype=np.uint16)
+        self.carry = np.empty(shape + (3,), dtype=np.uint16)
+        self.inv_alpha = np.empty(shape + (1,), dtype=np.uint16)
+
+    def render(self, t):
+        if self.fg.size == 0:
+            return self.frame
+        return self.blend(*self.sprite_frame(t))
+
+    def sprite_frame(self, t):
+        index = self.sprite.index_at(t)
+        return (self.sprite.shade[index][self.sprite_region],
+                self.sprite.alpha[index][self.sprite_region][..., None])
+
+    def blend(self, shade, alpha):
+        # out = (fg * a + bg * (255 - a)) / 255, all in uint16
+        np.take(self.lut, shade, axis=0, out=self.fg, mode='clip')
+        np.multiply(self.fg, alpha, out=self.fg)
+        np.subtract(255, alpha, out=self.inv_alpha)
+        np.multiply(self.background, self.inv_alpha, out=self.acc)
+        self.acc += self.fg
+        # Rounded division by 255 without an integer divide
+        self.acc += 128
+        np.right_shift(self.acc, 8, out=self.carry)
+        self.acc += self.carry
+        self.acc >>= 8
+
+        self.frame[self.region] = self.acc
+        return self.frame
+
+
+# Precomputed animation sprites (clock, think.gif, fallback bubbles), shared
+# by every clip in the process
+_sprite_cache = {}
+
 
 class TriviaVideoGenerator:
-    def __init__(self):
+    def __init__(self, profile=False):
         self.width = 1080  # YouTube Shorts dimensions
         self.height = 1920
+        self.fps = 30
+        self.codec = 'libx264'
+        self.encoder = DEFAULT_ENCODER
+        # Encoder threads per process; None lets ffmpeg decide
+        self.threads = None
+        # Encode static segments (answers) as a few held frames instead of
+        # one frame per 1/fps
+        self.vfr = False
+        # Every pixel size below is designed for 1080x1920 and multiplied by
+        # this factor, see scaled()
+        self.scale = 1.0
         self.duration_per_question = 6
         self.countdown_duration = 5
         self.answer_duration = 2  # Reduced answer duration to 2 seconds
         self.margin = 50  # Margin from all sides
+        # Size text and countdown slides are laid out in, centred in the
+        # frame; None uses the whole frame. Renditions share one canvas so
+        # their slides are rasterized once.
+        self.canvas = None
         self.background_color = (0, 0, 0)  # Dark background
+        self.countdown_color = (255, 223, 0)
+        self.think_color = (255, 223, 0)
+        self.question_color = (255, 223, 0)
+        self.answer_color = (0, 255, 127)
+        self.font_name = "arial.ttf"
+        self.cache_dir = os.path.join(get_app_dir(), ".render_cache")
+        # Encoded segments are kept in cache_dir and reused by any video
+        # that needs the same one, up to this many bytes
+        self.segment_cache_bytes = 2 * 1024 * 1024 * 1024
+        self._segment_cache = None
+        self.slide_cache = default_slide_cache
+        self.fonts = default_font_registry
+        self.last_render_stats = None
+        self.last_segment_stats = None
+        # Opt-in per-stage timing; the null profiler costs nothing
+        self.profiler = RenderProfiler() if profile else NULL_PROFILER
+        self.last_profile_report = None
+
+    def px(self, size):
+        # A pixel size from the 1080x1920 design at the current resolution
+        return max(1, int(round(size * self.scale)))
+
+    def scaled(self, scale, fps=None, encoder=None, vfr=None):
+        # A copy of this generator whose resolution, margin, font sizes and
+        # sprite geometry are all multiplied by `scale`; caches are shared
+        generator = copy.copy(self)
+        generator.scale = self.scale * scale
+        # yuv420p needs even dimensions
+        generator.width = max(2, int(round(self.width * scale / 2)) * 2)
+        generator.height = max(2, int(round(self.height * scale / 2)) * 2)
+        generator.margin = max(1, int(round(self.margin * scale)))
+        if fps:
+            generator.fps = fps
+        if encoder:
+            generator.encoder = encoder
+        if vfr is not None:
+            generator.vfr = vfr
+        return generator
+
+    def for_size(self, width, height):
+        # A copy rendering the same content at another size and aspect
+        # ratio; pixel sizes follow the short side
+        ratio = min(width, height) / min(self.width, self.height)
+        generator = copy.copy(self)
+        generator.scale = self.scale * ratio
+        generator.width, generator.height = width, height
+        generator.margin = max(1, int(round(self.margin * ratio)))
+        generator.canvas = None
+        return generator
+
+    @property
+    def short_side(self):
+        return min(self.width, self.height)
+
+    @property
+    def canvas_size(self):
+        return self.canvas or (self.width, self.height)
+
+    def place_slide(self, slide):
+        # Centre a slide laid out on the canvas in a full frame
+        height, width = slide.shape[:2]
+        if (width, height) == (self.width, self.height):
+            return slide
+        frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        frame[:] = self.background_color
+        x, y = (self.width - width) // 2, (self.height - height) // 2
+        frame[y:y + height, x:x + width] = slide
+        return frame
+
+    def preview(self, scale=PREVIEW_SCALE, fps=PREVIEW_FPS):
+        # Fast draft of the same video, e.g. 270x480 at 10 fps
+        return self.scaled(scale, fps, 'draft', vfr=True)
+
+    @property
+    def encoder_settings(self):
+        return ENCODER_PROFILES[self.encoder]
+
+    @property
+    def segment_cache(self):
+        # Follows cache_dir, so pointing cache_dir elsewhere moves it too
+        disk_dir = os.path.join(self.cache_dir, "segments")
+        if self._segment_cache is None or self._segment_cache.disk_dir != disk_dir:
+            self._segment_cache = SegmentCache(disk_dir, self.segment_cache_bytes)
+        return self._segment_cache
+
+    @property
+    def manifest_dir(self):
+        return os.path.join(self.cache_dir, "manifests")
+
+    def resumable_facts(self, output_file):
+        # Questions of an unfinished resumable render of output_file, or None
+        manifest = RenderManifest.load(manifest_path(self.manifest_dir, output_file))
+        return manifest.facts if manifest else None
+
+    def render_finished(self, output_file):
+        # An output without a manifest was joined completely
+        return (os.path.exists(output_file)
+                and not os.path.exists(manifest_path(self.manifest_dir, output_file)))
+
+    def open_manifest(self, output_file, facts, plan):
+        # Continue the manifest of an earlier attempt at the same video, or
+        # start a new one
+        path = manifest_path(self.manifest_dir, output_file)
+        keys = [self.segment_key(kind, text) for kind, text in plan]
+        manifest = RenderManifest.load(path)
+        if manifest is not None:
+            clear_partial_segments([self.segment_cache.path(key) for key in manifest.in_flight])
+            if manifest.matches(keys):
+                manifest.in_flight.clear()
+                manifest.save()
+                return manifest
+        return RenderManifest.create(path, output_file, facts, keys)
+
+    def evict_segments(self):
+        # Keeps the finished segments of renders that can still be resumed
+        self.segment_cache.evict(keep=pinned_segments(self.manifest_dir))
+
+    def clock_sprite(self, duration):
+        # The hand angle only depends on t / duration, so every frame of the
+        # clock is computed up front with NumPy and shared by all countdowns
+        w, h = int(self.short_side * 0.2), int(self.short_side * 0.2)
+        n_frames = max(1, int(round(duration * self.fps)))
+        key = ('clock', w, h, self.scale, n_frames, duration, self.countdown_color)
+        if key in _sprite_cache:
+            return _sprite_cache[key]
+
+        with self.profiler.stage('clock_sprite'):
+            sprite = self._build_clock_sprite(w, h, n_frames, duration)
+        _sprite_cache[key] = sprite
+        return sprite
+
+    def _build_clock_sprite(self, w, h, n_frames, duration):
+        margin = self.px(10)
+        cx, cy = w / 2, h / 2
+        radius = (w - 2 * margin) / 2
+        hand_length = (w/2 - margin) * 0.8
+
+        # The dial is drawn once; the hand is rotated for a whole batch of
+        # frames at a time
+        scene = Scene(w, h)
+        scene.add(FieldLayer(Ring(radius, self.px(3)), cx, cy))
+        scene.add(FieldLayer(Disc(self.px(5)), cx, cy))
+        scene.add(FieldLayer(Bar(hand_length, self.px(4)), cx, cy,
+                             rotation=lambda t: t / duration * 2 * math.pi))
+
+        frame_starts = np.arange(n_frames) / self.fps
+        alpha = scene.render(frame_starts)
+        return SpriteAnimation(alpha, alpha, self.countdown_color, frame_starts, n_frames / self.fps)
 
     def create_clock_animation(self, duration):
-        w, h = int(self.width * 0.2), int(self.width * 0.2)
-        
-        def make_frame(t):
-            surface = Image.new('RGBA', (w, h), (0, 0, 0, 0))
-            draw = ImageDraw.Draw(surface)
-            
-            margin = 10
-            draw.ellipse([margin, margin, w-margin, h-margin], 
-                        outline=(255, 223, 0), width=3)
-            
-            center = (w/2, h/2)
-            angle = (t / duration) * 2 * math.pi
-            hand_length = (w/2 - margin) * 0.8
-            
-            end_x = center[0] + hand_length * math.sin(angle)
-            end_y = center[1] - hand_length * math.cos(angle)
-            draw.line([center, (end_x, end_y)], fill=(255, 223, 0), width=4)
-            
-            dot_radius = 5
-            draw.ellipse([center[0]-dot_radius, center[1]-dot_radius,
-                         center[0]+dot_radius, center[1]+dot_radius],
-                        fill=(255, 223, 0))
-            
-            frame = np.array(surface)
-            rgb = frame[..., :3]
-            alpha = frame[..., 3:] / 255.0
-            return rgb * alpha + (1 - alpha) * np.array([0, 0, 0])
-        
-        return VideoClip(make_frame, duration=duration)
+        return self.clock_sprite(duration).to_clip(duration)
+
+    def load_think_asset(self):
+        # think.gif is decoded, resized and tinted once per process and shared
+        # by every question clip; a failed load is remembered as None
+        w = int(self.short_side * 0.3)
+        key = ('think', w, self.think_color)
+        if key in _sprite_cache:
+            return _sprite_cache[key]
 
-    def create_think_animation(self, duration):
         try:
-            # Get the correct path whether running as script or executable
-            if getattr(sys, 'frozen', False):
-                # Running as compiled executable
-                base_path = sys._MEIPASS
-            else:
-                # Running as script
-                base_path = os.path.dirname(os.path.abspath(__file__))
-                
-            gif_path = os.path.join(base_path, "think.gif")
-            clip = VideoFileClip(gif_path)
-            
-            w = int(self.width * 0.3)  
-            h = int(w * clip.h / clip.w)
-            
-            clip = clip.resize((w, h), resample="lanczos")
-            
-            clip = clip.loop(duration=duration)
-            
-            clip = clip.set_color((255, 223, 0))
-            
-            return clip
+            gif_path = os.path.join(get_asset_dir(), "think.gif")
+            with self.profiler.stage('gif_decode'), Image.open(gif_path) as gif:
+                h = int(w * gif.height / gif.width)
+                shades, alphas, frame_starts = [], [], []
+                elapsed = 0.0
+                for frame in ImageSequence.Iterator(gif):
+                    rgba = frame.convert('RGBA').resize((w, h), Image.Resampling.LANCZOS)
+                    shades.append(np.asarray(rgba.convert('L')))
+                    alphas.append(np.asarray(rgba.getchannel('A')))
+                    frame_starts.append(elapsed)
+                    elapsed += (frame.info.get('duration') or 100) / 1000.0
+
+            shade = np.stack(shades)
+            alpha = np.stack(alphas)
+
+            # Stretch the luminance of the visible pixels so the brightest
+            # one maps to the full tint colour
+            peak = int(shade[alpha > 0].max()) if alpha.any() else 255
+            shade = (shade.astype(np.uint16) * 255 // max(peak, 1)).clip(0, 255).astype(np.uint8)
+
+            asset = SpriteAnimation(shade, alpha, self.think_color, np.array(frame_starts), elapsed)
         except Exception as e:
             print(f"Warning: Could not load think.gif - {str(e)}")
-            return self._create_fallback_think_animation(duration)
-            
+            asset = None
+
+        _sprite_cache[key] = asset
+        return asset
+
+    def think_sprite(self):
+        return self.load_think_asset() or self._fallback_think_sprite()
+
+    def create_think_animation(self, duration):
+        return self.think_sprite().to_clip(duration)
+
+    def _fallback_think_sprite(self):
+        # The bubbles repeat every second, so one second of frames is drawn
+        # once and looped
+        w, h = int(self.short_side * 0.3), int(self.short_side * 0.2)
+        key = ('bubbles', w, h, self.scale, self.fps, self.think_color)
+        if key in _sprite_cache:
+            return _sprite_cache[key]
+
+        with self.profiler.stage('bubble_sprite'):
+            sprite = self._build_bubble_sprite(w, h)
+        _sprite_cache[key] = sprite
+        return sprite
+
+    def _build_bubble_sprite(self, w, h):
+        # Four bubbles bobbing and pulsing a third of a cycle apart
+        bubbles = [
+            (0.2, 0.8, 15, 0),
+            (0.4, 0.7, 20, math.pi/3),
+            (0.6, 0.6, 25, 2*math.pi/3),
+            (0.8, 0.5, 30, math.pi)
+        ]
+
+        scene = Scene(w, h)
+        for x_ratio, y_ratio, size, phase_offset in bubbles:
+            size = self.px(size)
+            bob = wave(self.px(20), phase=phase_offset)
+            scene.add(MaskLayer(
+                ellipse_mask(size, size),
+                int(w * x_ratio),
+                # Whole pixels towards the resting height
+                lambda t, base_y=int(h * y_ratio), bob=bob: base_y + np.trunc(bob(t)),
+                opacity=wave(0.5, phase=phase_offset, offset=0.5)
+            ))
+
+        alpha = scene.render(np.arange(self.fps) / self.fps)
+        shade = np.full_like(alpha, 255)
+        return SpriteAnimation(shade, alpha, self.think_color, np.arange(self.fps) / self.fps, 1.0)
+
     def _create_fallback_think_animation(self, duration):
-        w, h = int(self.width * 0.3), int(self.width * 0.2)
-        
-        def make_frame(t):
-            surface = Image.new('RGBA', (w, h), (0, 0, 0, 0))
-            draw = ImageDraw.Draw(surface)
-            
-            phase = t * 2 * math.pi
-            
-            bubbles = [
-                (0.2, 0.8, 15, 0),
-                (0.4, 0.7, 20, math.pi/3),
-                (0.6, 0.6, 25, 2*math.pi/3),
-                (0.8, 0.5, 30, math.pi)
-            ]
-            
-            for x_ratio, y_ratio, size, phase_offset in bubbles:
-                x = int(w * x_ratio)
-                base_y = int(h * y_ratio)
-                y_offset = int(20 * math.sin(phase + phase_offset))
-                y = base_y + y_offset
-                
-                opacity = int(255 * (0.5 + 0.5 * math.sin(phase + phase_offset)))
-                
-                draw.ellipse([x-size, y-size, x+size, y+size],
-                           fill=(255, 223, 0, opacity))
-            
-            frame = np.array(surface)
-            rgb = frame[..., :3]
-            alpha = frame[..., 3:] / 255.0
-            return rgb * alpha + (1 - alpha) * np.array([0, 0, 0])
-        
-        return VideoClip(make_frame, duration=duration)
+        return self._fallback_think_sprite().to_clip(duration)
+
+    def text_slide(self, text, font_size=70, color=(255, 255, 255), is_question=True):
+        # Rendered slides are cached by content, so repeated answers and
+        # questions skip rasterization
+        font_size = self.px(font_size)
+        key = content_key(
+            'text', RENDER_VERSION, text, self.fonts.resolve(self.font_name), font_size, tuple(color),
+            self.canvas_size, self.margin, self.background_color
+        )
+        def render():
+            with self.profiler.stage('text_rasterization'):
+                return self._render_text_image(text, font_size, color, is_question)
+
+        return self.place_slide(self.slide_cache.get_or_render(key, render))
 
     def create_text_image(self, text, font_size=70, color=(255, 255, 255), is_question=True):
-        image = Image.new('RGB', (self.width, self.height), self.background_color)
+        return Image.fromarray(self.text_slide(text, font_size, color, is_question))
+
+    def _render_text_image(self, text, font_size=70, color=(255, 255, 255), is_question=True):
+        width, height = self.canvas_size
+        image = Image.new('RGB', (width, height), self.background_color)
         draw = ImageDraw.Draw(image)
         
-        try:
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            font = ImageFont.load_default()
+        # Wrap on pixel widths and shrink the font until the text fits
+        max_width = width - (2 * self.margin)
+        max_height = height - (2 * self.margin)
+        spacing = self.px(10)
+        metrics, wrapped_text = self.fonts.fit(text, self.font_name, font_size, max_width, max_height,
+                                               min_size=self.px(24), spacing=spacing)
+        font = metrics.font
         
-        max_width = self.width - (2 * self.margin)
-        wrapped_text = wrap(text, width=30)  
-        
-        bbox = draw.textbbox((0, 0), "hg", font=font)
-        line_height = bbox[3] - bbox[1] + 10
+        line_height = metrics.text_height + spacing
         total_height = line_height * len(wrapped_text)
         
-        y = (self.height - total_height) // 2
+        y = (height - total_height) // 2
         
         for line in wrapped_text:
-            bbox = draw.textbbox((0, 0), line, font=font)
-            line_width = bbox[2] - bbox[0]
-            x = (self.width - line_width) // 2  
+            line_width = metrics.width(line)
+            x = int(width - line_width) // 2  
             
-            shadow_offset = 3
+            shadow_offset = self.px(3)
             draw.text((x + shadow_offset, y + shadow_offset), line, 
                      font=font, fill=(0, 0, 0))  
             draw.text((x, y), line, font=font, fill=color)  
@@ -144,70 +573,365 @@ class TriviaVideoGenerator:
         
         return image
 
-    def create_text_clip(self, text, duration, font_size=70, color=(255, 255, 255), is_question=True):
-        image = self.create_text_image(text, font_size, color, is_question)
-        base_clip = ImageClip(np.array(image), duration=duration)
+    def make_compositor(self, background, sprite, x, y):
+        compositor = RegionCompositor(background, sprite, x, y)
+        if self.profiler.enabled:
+            compositor.sprite_frame = self.profiler.wrap_frame('sprite_frame', compositor.sprite_frame)
+            compositor.blend = self.profiler.wrap_frame('composite', compositor.blend)
+        return compositor
+
+    def text_spans(self, text, duration, font_size=70, color=(255, 255, 255), is_question=True):
+        image = self.text_slide(text, font_size, color, is_question)
         
         if is_question:
-            think_clip = self.create_think_animation(duration)
-            think_clip = think_clip.set_position(('center', 0.8), relative=True)
-            return CompositeVideoClip([base_clip, think_clip])
+            sprite = self.think_sprite()
+            compositor = self.make_compositor(
+                image,
+                sprite,
+                (self.width - sprite.w) // 2,
+                # Keep the whole animation in frame on wide renditions
+                min(self.height * 0.8, self.height - sprite.h - self.margin)
+            )
+            return [(compositor.render, duration)]
         
-        return base_clip
+        return [(StaticFrame(image), duration)]
+
+    def create_text_clip(self, text, duration, font_size=70, color=(255, 255, 255), is_question=True):
+        return spans_to_clip(self.text_spans(text, duration, font_size, color, is_question))
+
+    def countdown_slide(self, number):
+        key = content_key(
+            'countdown', RENDER_VERSION, str(number), self.fonts.resolve(self.font_name), self.px(200),
+            self.countdown_color,
+            self.canvas_size, self.background_color
+        )
+        def render():
+            with self.profiler.stage('text_rasterization'):
+                return self._render_countdown_image(number)
+
+        return self.place_slide(self.slide_cache.get_or_render(key, render))
 
     def create_countdown_image(self, number):
-        image = Image.new('RGB', (self.width, self.height), self.background_color)
+        return Image.fromarray(self.countdown_slide(number))
+
+    def _render_countdown_image(self, number):
+        width, height = self.canvas_size
+        image = Image.new('RGB', (width, height), self.background_color)
         draw = ImageDraw.Draw(image)
         
-        try:
-            font = ImageFont.truetype("arial.ttf", 200)
-        except:
-            font = ImageFont.load_default()
+        font = self.fonts.get(self.font_name, self.px(200))
         
         text = str(number)
         bbox = draw.textbbox((0, 0), text, font=font)
         text_width = bbox[2] - bbox[0]
         text_height = bbox[3] - bbox[1]
         
-        x = (self.width - text_width) // 2
-        y = (self.height - text_height) // 2
+        x = (width - text_width) // 2
+        y = (height - text_height) // 2
         
-        shadow_offset = 5
+        shadow_offset = self.px(5)
         draw.text((x + shadow_offset, y + shadow_offset), text, 
                  font=font, fill=(0, 0, 0))  
-        draw.text((x, y), text, font=font, fill=(255, 223, 0))  
+        draw.text((x, y), text, font=font, fill=self.countdown_color)  
         
         return image
 
-    def create_countdown(self, duration):
-        frames = []
+    def countdown_spans(self, duration):
+        spans = []
         frame_duration = duration / self.countdown_duration  
         
+        clock = self.clock_sprite(frame_duration)
+        
         for i in range(self.countdown_duration, 0, -1):
-            base_frame = ImageClip(np.array(self.create_countdown_image(i)), 
-                                 duration=frame_duration)
-            
-            clock_clip = self.create_clock_animation(frame_duration)
-            clock_clip = clock_clip.set_position(('center', 0.6), relative=True)
-            
-            frame_clip = CompositeVideoClip([base_frame, clock_clip])
-            frames.append(frame_clip)
+            compositor = self.make_compositor(
+                self.countdown_slide(i),
+                clock,
+                (self.width - clock.w) // 2,
+                self.height * 0.6
+            )
+            spans.append((compositor.render, frame_duration))
         
-        return concatenate_videoclips(frames)
+        return spans
+
+    def create_countdown(self, duration):
+        return spans_to_clip(self.countdown_spans(duration))
+
+    def segment_spans(self, kind, text=None):
+        # A segment is a list of (make_frame, duration) spans; make_frame may
+        # hand back the same preallocated buffer on every call
+        if kind == 'countdown':
+            return self.countdown_spans(self.countdown_duration)
+        if kind == 'question':
+            return self.text_spans(
+                text,
+                self.duration_per_question,
+                color=self.question_color,
+                is_question=True
+            )
+        return self.text_spans(
+            text,
+            self.answer_duration,
+            color=self.answer_color,
+            is_question=False
+        )
+
+    def is_static(self, spans):
+        return len(spans) == 1 and isinstance(spans[0][0], StaticFrame)
+
+    def write_spans(self, spans, path, engine='moviepy', progress=None):
+        if engine == 'pipe' or (self.vfr and self.is_static(spans)):
+            # Static VFR segments go through ffmpeg for both engines; moviepy
+            # can only write constant frame rates
+            return self.write_frames(spans, path, progress)
+
+        if progress:
+            progress.begin_segment(sum(int(round(duration * self.fps)) for _, duration in spans))
+            spans = [(progress.wrap(make_frame), duration) for make_frame, duration in spans]
+        if self.profiler.enabled:
+            spans = [(self.profiler.wrap_frame('make_frame', make_frame), duration)
+                     for make_frame, duration in spans]
 
-    def fetch_trivia_facts(self):
+        clip = spans_to_clip(spans)
         try:
-            response = requests.get('https://opentdb.com/api.php?amount=5&type=multiple')
-            data = response.json()
-            
-            if data['response_code'] == 0:
-                return data['results']
-            else:
-                return None
-        except:
+            with self.profiler.stage('write_videofile'):
+                self.write_segment(clip, path, RenderProgressLogger(progress) if progress else None)
+        finally:
+            clip.close()
+
+    def write_frames(self, spans, path, progress=None):
+        # Frames go straight from the compositor into ffmpeg's stdin. A static
+        # VFR segment encodes a few frames at each end and one long gap in
+        # between, where players hold the frame; the encoder still runs at
+        # self.fps, so the stream parameters match the other segments.
+        if self.profiler.enabled and not (self.vfr and self.is_static(spans)):
+            # segment_frames has to see a static segment's StaticFrame
+            spans = [(self.profiler.wrap_frame('make_frame', make_frame), duration)
+                     for make_frame, duration in spans]
+        frames, held_frames = self.segment_frames(spans)
+        if progress:
+            progress.begin_segment(sum(int(round(duration * self.fps)) for _, duration in spans) - held_frames)
+        writer = self.segment_writer(path, held_frames,
+                                     on_encoded=progress.set_segment_encoded if progress else None)
+        write_frame = self.profiler.wrap_frame('encoder_write', writer.write_frame)
+        try:
+            for frame in frames:
+                write_frame(frame)
+                if progress:
+                    progress.frame_rendered()
+        finally:
+            with self.profiler.stage('encoder_flush'):
+                writer.close()
+
+    def segment_writer(self, path, held_frames=0, on_encoded=None):
+        # ffmpeg writer with the stream settings every segment shares. With
+        # held_frames, the encoded frames after the leading edge are shifted
+        # by that many frames, so the last edge frame is held over the gap.
+        params = encoder_params(self.encoder, self.fps)
+        if held_frames:
+            edge = STATIC_EDGE_FRAMES
+            params = ['-vf', f'setpts=if(lt(N\\,{edge})\\,N\\,N+{held_frames})',
+                      '-vsync', 'vfr'] + params
+        return FFmpegPipeWriter(path, (self.width, self.height), self.fps, self.codec, on_encoded=on_encoded,
+                                preset=self.encoder_settings['preset'], threads=self.threads, params=params)
+
+    def segment_frames(self, spans):
+        # (frames, held_frames) for a segment_writer: the frames to encode, in
+        # order and possibly sharing one buffer, and how many a static VFR
+        # segment holds instead
+        if self.vfr and self.is_static(spans):
+            frames = int(round(spans[0][1] * self.fps))
+            count = self.static_frame_count(frames)
+            return itertools.repeat(spans[0][0].frame, count), frames - count
+        return (make_frame(i / self.fps)
+                for make_frame, duration in spans
+                for i in range(int(round(duration * self.fps)))), 0
+
+    def write_segment(self, clip, path, logger=None):
+        # Every segment is encoded with the same parameters so they can be
+        # joined later without re-encoding
+        clip.write_videofile(
+            path,
+            fps=self.fps,
+            codec=self.codec,
+            preset=self.encoder_settings['preset'],
+            threads=self.threads,
+            ffmpeg_params=encoder_params(self.encoder, self.fps),
+            audio=False,
+            logger=logger  # None suppresses moviepy stdout logging
+        )
+
+    def segment_frame_count(self, kind):
+        if kind == 'countdown':
+            frame_duration = self.countdown_duration / self.countdown_duration
+            return self.countdown_duration * int(round(frame_duration * self.fps))
+        duration = self.duration_per_question if kind == 'question' else self.answer_duration
+        frames = int(round(duration * self.fps))
+        if kind == 'answer' and self.vfr:
+            return self.static_frame_count(frames)
+        return frames
+
+    def static_frame_count(self, frames):
+        return min(frames, 2 * STATIC_EDGE_FRAMES)
+
+    def segment_duration(self, kind):
+        if kind == 'countdown':
+            return self.countdown_duration
+        return self.duration_per_question if kind == 'question' else self.answer_duration
+
+    def segment_key(self, kind, text=None):
+        # Hash of everything that affects an encoded segment: its content,
+        # layout, timing, stream parameters and the drawing code's version
+        style = (
+            RENDER_VERSION, self.width, self.height, self.canvas_size, self.scale, self.margin, self.fps, self.codec,
+            sorted(self.encoder_settings.items()), self.fonts.resolve(self.font_name), self.background_color
+        )
+        if kind == 'countdown':
+            return content_key(kind, style, self.countdown_duration, self.countdown_color)
+        if kind == 'question':
+            # The fallback bubbles replace think.gif when it cannot be loaded
+            return content_key(kind, text, style, self.duration_per_question, self.question_color,
+                               self.think_color, self.load_think_asset() is not None)
+        return content_key(kind, text, style, self.answer_duration, self.answer_color, self.vfr)
+
+    def warm_up(self, engine='moviepy'):
+        # Load everything shared between videos ahead of the first job,
+        # including the lazy imports and ffmpeg lookup a cached countdown
+        # would otherwise leave to it
+        _ffmpeg_binary()
+        if engine == 'moviepy':
+            import moviepy.video.compositing.concatenate
+        self.fonts.metrics(self.font_name, self.px(70))
+        self.think_sprite()
+        self.get_countdown_segment(engine)
+
+    def video_duration(self, question_count):
+        per_question = self.duration_per_question + self.countdown_duration + self.answer_duration
+        return question_count * per_question
+
+    def get_countdown_segment(self, engine='moviepy', progress=None):
+        # The countdown is identical for every question, so it is rendered and
+        # encoded once per resolution/fps/style and spliced into each video
+        return self.cached_segment('countdown', None, engine, progress)
+
+    def cached_segment(self, kind, text=None, engine='moviepy', progress=None):
+        # Path of the encoded segment, rendered only when the segment cache
+        # does not have it yet
+        key = self.segment_key(kind, text)
+        path = self.segment_cache.get(key)
+        if path:
+            if progress:
+                progress.frames_done(self.segment_frame_count(kind))
+            return path
+        return self.segment_cache.put(key, lambda temp_path: self.render_segment(kind, text, temp_path, engine,
+                                                                                 progress))
+
+    def fetch_trivia_facts(self, amount=5, category_id=None, offline=False):
+        # Questions come from the local question bank, which tops itself up
+        # from OpenTDB when it runs short
+        bank = QuestionBank()
+        try:
+            facts = bank.get_questions(amount, category_id, offline=offline)
+        except Exception as e:
+            print(f"Warning: Could not load questions - {str(e)}")
             return None
+        finally:
+            # Release the pooled HTTP connections
+            bank.close()
+        return facts or None
+
+    def render_segment(self, kind, text, path, engine='moviepy', progress=None):
+        # Render one question/countdown/answer segment to its own file. Its
+        # frames, compositor buffers and clips are built here and released
+        # when it returns, so memory stays flat however many questions the
+        # video has; only the bounded slide and sprite caches persist.
+        self.write_spans(self.segment_spans(kind, text), path, engine, progress)
+        return path
+
+    def render_segments(self, plan, workers=1, progress=None, engine='moviepy', manifest=None):
+        # Encoded segment for every (kind, text) in the plan. Segments already
+        # in the segment cache are reused, and each distinct missing one is
+        # rendered once, here or in `workers` processes. A manifest records
+        # every segment as it starts and finishes.
+        keys = [self.segment_key(kind, text) for kind, text in plan]
+        found = {}
+        missing = {}
+        for key, (kind, text) in zip(keys, plan):
+            if key in found or key in missing:
+                pass
+            elif self.segment_cache.get(key):
+                found[key] = self.segment_cache.path(key)
+                if manifest and key not in manifest.completed:
+                    manifest.finish(key, found[key])
+            else:
+                missing[key] = (kind, text)
+                continue
+            # Reused segments, including repeats within this video, are done
+            if progress:
+                progress.frames_done(self.segment_frame_count(kind))
+        self.last_segment_stats = {'segments': len(plan), 'rendered': len(missing)}
+
+        if workers <= 1:
+            for key, (kind, text) in missing.items():
+                if manifest:
+                    manifest.start(key)
+                found[key] = self.segment_cache.put(
+                    key, lambda path: self.render_segment(kind, text, path, engine, progress))
+                if manifest:
+                    manifest.finish(key, found[key])
+            return [found[key] for key in keys]
+
+        # Each segment is rendered in its own process with identical codec
+        # settings
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_segment_worker,
+                                 initargs=(self, workers)) as pool:
+            futures = {}
+            for key, (kind, text) in missing.items():
+                if manifest:
+                    manifest.start(key)
+                futures[pool.submit(_render_segment_job, kind, text, key, engine)] = key
+
+            # Worker processes report whole segments as they finish
+            for future in as_completed(futures):
+                key = futures[future]
+                found[key], profile = future.result()
+                self.profiler.merge(profile)
+                if manifest:
+                    manifest.finish(key, found[key])
+                if progress:
+                    progress.frames_done(self.segment_frame_count(missing[key][0]), rendered=True)
+        return [found[key] for key in keys]
+
+    def set_output_options(self, encoder=None, vfr=None):
+        if encoder:
+            if encoder not in ENCODER_PROFILES:
+                raise ValueError(f"Unknown encoder profile: {encoder}")
+            # Kept for later renders, and copied into segment workers
+            self.encoder = encoder
+        if vfr is not None:
+            self.vfr = vfr
 
-    def generate_video(self, facts=None, progress_callback=None):
+    def video_plan(self, facts):
+        # 3 segments per fact: question, countdown, answer
+        plan = []
+        for fact in facts:
+            plan.append(('question', html.unescape(fact['question'])))
+            plan.append(('countdown', None))
+            plan.append(('answer', html.unescape(fact['correct_answer'])))
+        return plan
+
+    def generate_video(self, facts=None, progress_callback=None, workers=1, engine='moviepy',
+                       output_file=None, encoder=None, vfr=None, resume=False):
+        # With resume=True the render keeps a manifest until the video is
+        # joined; running it again after a crash reuses its questions and
+        # every segment that was finished
+        if engine not in RENDER_ENGINES:
+            raise ValueError(f"Unknown render engine: {engine}")
+        if resume and output_file is None:
+            raise ValueError("Resumable renders need an output_file")
+        self.set_output_options(encoder, vfr)
+
+        if facts is None and resume:
+            facts = self.resumable_facts(output_file)
         if facts is None:
             facts = self.fetch_trivia_facts()
         
@@ -215,88 +939,207 @@ class TriviaVideoGenerator:
             print("No facts provided")
             return
 
-        clips = []
-        total_steps = len(facts) * 3  # 3 steps per fact: question, countdown, answer
-        current_step = 0
-        
-        for fact in facts:
-            # Create question clip
-            if progress_callback:
-                progress_callback(current_step / total_steps * 100, "Creating question clip...")
-            question = html.unescape(fact['question'])
-            question_clip = self.create_text_clip(
-                question,
-                self.duration_per_question,
-                color=(255, 223, 0),
-                is_question=True
-            )
-            current_step += 1
-            
-            # Create countdown
-            if progress_callback:
-                progress_callback(current_step / total_steps * 100, "Creating countdown animation...")
-            countdown = self.create_countdown(self.countdown_duration)
-            current_step += 1
-            
-            # Create answer clip
-            if progress_callback:
-                progress_callback(current_step / total_steps * 100, "Creating answer clip...")
-            answer = html.unescape(fact['correct_answer'])
-            answer_clip = self.create_text_clip(
-                answer,
-                self.answer_duration,
-                color=(0, 255, 127),
-                is_question=False
-            )
-            current_step += 1
-            
-            clips.extend([question_clip, countdown, answer_clip])
-
-        if progress_callback:
-            progress_callback(95, "Rendering final video...")
-            
-        final_clip = concatenate_videoclips(clips)
-        
-        try:
-            # Get the directory of the running script/executable
-            if getattr(sys, 'frozen', False):
-                # Running as compiled executable
-                script_dir = os.path.dirname(sys.executable)
-            else:
-                # Running as script
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-            
+        if output_file is None:
             # Create output filename with timestamp
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = os.path.join(script_dir, f"trivia_video_{timestamp}.mp4")
-            
+            output_file = os.path.join(get_app_dir(), f"trivia_video_{timestamp}.mp4")
+        script_dir = os.path.dirname(os.path.abspath(output_file))
+
+        try:
             # Ensure the output directory exists and is writable
             if not os.access(script_dir, os.W_OK):
                 raise PermissionError(f"No write permission in the directory: {script_dir}")
-                
-            final_clip.write_videofile(
-                output_file,
-                fps=30,
-                codec='libx264',
-                audio=False,
-                logger=None  # Suppress moviepy stdout logging
+
+            plan = self.video_plan(facts)
+            manifest = self.open_manifest(output_file, facts, plan) if resume else None
+            total_frames = sum(self.segment_frame_count(kind) for kind, _ in plan)
+            progress = RenderProgress(total_frames, progress_callback)
+            progress.report(force=True)
+
+            self.profiler.reset()
+            with self.profiler.stage('render_segments'):
+                segments = self.render_segments(plan, workers, progress, engine, manifest)
+            self.last_render_stats = progress.snapshot()
+
+            if progress_callback:
+                progress_callback(95, "Joining video segments...")
+
+            if manifest:
+                manifest.set_state(JOINING)
+            with self.profiler.stage('concat'):
+                durations = [self.segment_duration(kind) for kind, _ in plan] if self.vfr else None
+                concat_segments(segments, output_file, self.encoder_settings['faststart'], durations)
+            if manifest:
+                manifest.remove()
+
+            # Only once the video is joined, so none of its segments go
+            with self.profiler.stage('segment_cache_evict'):
+                self.evict_segments()
+
+            self.last_profile_report = self.profiler.write_report(
+                os.path.splitext(output_file)[0] + ".profile.json",
+                output_file=output_file,
+                engine=engine,
+                workers=workers,
+                resolution=[self.width, self.height],
+                fps=self.fps,
+                encoder=self.encoder,
+                vfr=self.vfr,
+                render=self.last_render_stats,
+                segments=self.last_segment_stats
             )
-            
+
             if not os.path.exists(output_file):
                 raise Exception("Failed to write video file")
-                
+
+        except RenderCancelled:
+            raise
         except Exception as e:
             print(f"Error writing video file: {str(e)}")
             raise Exception(f"Failed to generate video: {str(e)}")
-        finally:
-            # Clean up the video clip
-            final_clip.close()
             
         if progress_callback:
             progress_callback(100, "Video generated successfully!")
             
         return output_file
 
+    def generate_renditions(self, facts=None, renditions=tuple(RENDITIONS), progress_callback=None,
+                            output_dir=None, name=None, encoder=None, vfr=None):
+        # Render the same quiz at several sizes in one pass. Sprites are sized
+        # from the short side and slides are laid out on a canvas common to
+        # every rendition, so both are computed once and shared; each segment
+        # is then composited and encoded for all renditions concurrently, one
+        # ffmpeg process per rendition. Writes <name>_<rendition>.mp4 files and
+        # returns {rendition: output file}.
+        unknown = [name for name in renditions if name not in RENDITIONS]
+        if unknown:
+            raise ValueError(f"Unknown renditions: {', '.join(unknown)}")
+        self.set_output_options(encoder, vfr)
+
+        if facts is None:
+            facts = self.fetch_trivia_facts()
+
+        if not facts:
+            print("No facts provided")
+            return
+
+        output_dir = output_dir or get_app_dir()
+        if name is None:
+            name = f"trivia_video_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        generators = {}
+        for rendition in renditions:
+            width, height = RENDITIONS[rendition]
+            # Renditions follow this generator's scale, e.g. for previews
+            generators[rendition] = self.for_size(max(2, int(round(width * self.scale / 2)) * 2),
+                                             max(2, int(round(height * self.scale / 2)) * 2))
+        canvas = (min(g.width for g in generators.values()), min(g.height for g in generators.values()))
+        for generator in generators.values():
+            generator.canvas = canvas
+            # The encoders run side by side and share the cores
+            generator.threads = self.threads or max(1, (os.cpu_count() or 1) // len(generators))
+
+        try:
+            if not os.access(output_dir, os.W_OK):
+                raise PermissionError(f"No write permission in the directory: {output_dir}")
+
+            plan = self.video_plan(facts)
+            total_frames = sum(generator.segment_frame_count(kind)
+                               for generator in generators.values() for kind, _ in plan)
+            progress = RenderProgress(total_frames, progress_callback)
+            progress.report(force=True)
+
+            self.profiler.reset()
+            paths = {rendition: [] for rendition in generators}
+            rendered = 0
+            with self.profiler.stage('render_segments'), ThreadPoolExecutor(len(generators)) as pool:
+                for kind, text in plan:
+                    futures = {}
+                    for rendition, generator in generators.items():
+                        key = generator.segment_key(kind, text)
+                        path = generator.segment_cache.get(key)
+                        if path:
+                            paths[rendition].append(path)
+                            progress.frames_done(generator.segment_frame_count(kind))
+                            continue
+                        # Spans are built one rendition after another, so
+                        # only the first one rasterizes the shared slide
+                        spans = generator.segment_spans(kind, text)
+                        write = functools.partial(generator.write_spans, spans, engine='pipe')
+                        futures[pool.submit(generator.segment_cache.put, key, write)] = rendition
+
+                    for future in as_completed(futures):
+                        rendition = futures[future]
+                        future.result()
+                        progress.frames_done(generators[rendition].segment_frame_count(kind), rendered=True)
+                    for future, rendition in futures.items():
+                        paths[rendition].append(future.result())
+                    rendered += len(futures)
+            self.last_render_stats = progress.snapshot()
+            self.last_segment_stats = {'segments': len(plan) * len(generators), 'rendered': rendered}
+
+            if progress_callback:
+                progress_callback(95, "Joining video segments...")
+
+            outputs = {}
+            with self.profiler.stage('concat'):
+                for rendition, generator in generators.items():
+                    output_file = os.path.join(output_dir, f"{name}_{rendition}.mp4")
+                    durations = None
+                    if generator.vfr:
+                        durations = [generator.segment_duration(kind) for kind, _ in plan]
+                    concat_segments(paths[rendition], output_file, generator.encoder_settings['faststart'],
+                                    durations)
+                    outputs[rendition] = output_file
+
+            with self.profiler.stage('segment_cache_evict'):
+                self.evict_segments()
+
+            self.last_profile_report = self.profiler.write_report(
+                os.path.join(output_dir, f"{name}.profile.json"),
+                outputs=outputs,
+                engine='pipe',
+                renditions={rendition: [g.width, g.height] for rendition, g in generators.items()},
+                fps=self.fps,
+                encoder=self.encoder,
+                vfr=self.vfr,
+                render=self.last_render_stats,
+                segments=self.last_segment_stats
+            )
+
+        except RenderCancelled:
+            raise
+        except Exception as e:
+            print(f"Error writing video files: {str(e)}")
+            raise Exception(f"Failed to generate videos: {str(e)}")
+
+        if progress_callback:
+            progress_callback(100, "Videos generated successfully!")
+
+        return outputs
+
+
+# Generator kept warm in each segment worker process
+_worker_generator = None
+
+
+def _init_segment_worker(generator, workers=1):
+    global _worker_generator
+    _worker_generator = generator
+    _worker_generator.profiler.reset()
+    # Share the cores between the workers' encoders instead of letting each
+    # ffmpeg start a thread per core
+    if not generator.threads:
+        generator.threads = max(1, (os.cpu_count() or 1) // workers)
+
+
+def _render_segment_job(kind, text, key, engine):
+    # Profiling data collected in the worker travels back with the result
+    path = _worker_generator.segment_cache.put(
+        key, lambda temp_path: _worker_generator.render_segment(kind, text, temp_path, engine))
+    return path, _worker_generator.profiler.take_raw()
+
+
 if __name__ == "__main__":
     generator = TriviaVideoGenerator()
     generator.generate_video()
@@ -0,0 +1,50 @@
+import hashlib
+import os
+import tempfile
+import time
+import urllib.request
+
+from app_paths import get_app_dir
+
+# Seconds a downloaded asset is used before it is fetched again
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+def default_cache_dir():
+    return os.path.join(get_app_dir(), "cache", "web")
+
+
+def fetch_cached(url, ttl=DEFAULT_TTL, cache_dir=None, timeout=10):
+    # Bytes at `url`, served from disk while the stored copy is younger than
+    # `ttl` seconds. When the download fails, a stale copy is returned
+    # instead of the error.
+    cache_dir = cache_dir or default_cache_dir()
+    path = os.path.join(cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except OSError:
+        age = None
+    if age is not None and age < ttl:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            data = response.read()
+    except OSError:
+        if age is None:
+            raise
+        with open(path, 'rb') as f:
+            return f.read()
+
+    # Write to a temporary file first so readers never see a partial copy
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return data